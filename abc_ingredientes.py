@@ -1,5 +1,7 @@
 import pandas as pd
 import os
+import profiling
+import backend_duckdb
 
 def clean_ingredient_data(input_file, output_file):
     """
@@ -76,23 +78,33 @@ def calculate_total_ingredients(sales_file, ingredients_file, output_file):
     Calcula la cantidad total de ingredientes necesarios basado en las ventas de productos de clase A.
 
     Parámetros:
-    - sales_file: str, archivo CSV con datos de ventas.
+    - sales_file: str, archivo CSV con datos de ventas, o carpeta/archivo parquet con las ventas
+      particionadas (FuenteParticionada), que se agregan con DuckDB sin cargarlas en memoria.
     - ingredients_file: str, archivo CSV con datos de ingredientes.
     - output_file: str, archivo CSV donde se guarda el resultado.
 
     Devuelve:
     - Un archivo CSV con los ingredientes requeridos.
     """
-    # Cargar datos de ventas y de ingredientes
-    sales_data = pd.read_csv(sales_file)
+    # Cargar datos de ingredientes
     ingredients_data = pd.read_csv(ingredients_file, index_col=0)
 
     # Filtrar productos de clase A basados en los ingredientes
     class_a_products = ingredients_data.index  # Los productos de clase A están en el índice de ingredientes
-    filtered_sales = sales_data[sales_data['article'].isin(class_a_products)]
 
-    # Agrupar y sumar la cantidad total vendida de cada producto de clase A
-    total_sales = filtered_sales.groupby('article')['Quantity'].sum()
+    if backend_duckdb.es_fuente_particionada(sales_file):
+        # Filtrar y sumar las cantidades vendidas en DuckDB, sin cargar las ventas en memoria
+        total_sales = backend_duckdb.cantidades_por_articulo(sales_file, class_a_products)
+    else:
+        # Cargar datos de ventas
+        with profiling.stage('load_sales_and_ingredients') as etapa:
+            sales_data = pd.read_csv(sales_file)
+            etapa.record(filas=len(sales_data))
+        filtered_sales = sales_data[sales_data['article'].isin(class_a_products)]
+
+        # Agrupar y sumar la cantidad total vendida de cada producto de clase A
+        with profiling.stage('calculate_total_ingredients', filas=len(filtered_sales)):
+            total_sales = filtered_sales.groupby('article')['Quantity'].sum()
 
     # Calcular el total de ingredientes necesarios
     total_ingredients = ingredients_data.mul(total_sales, axis=0).sum()
@@ -104,7 +116,7 @@ def calculate_total_ingredients(sales_file, ingredients_file, output_file):
 # Ruta de archivos y ejecución del flujo
 input_file = 'Ingredientes.csv'  # Archivo de ingredientes original
 output_file = 'cleaned_ingredient_data.csv'  # Archivo de ingredientes limpios
-sales_file = 'clean_sales_data.csv'  # Archivo de ventas limpias
+sales_file = 'clean_sales_data.csv'  # Archivo de ventas limpias (o carpeta con las ventas en parquet particionado)
 insumos_totales = 'total_ingredients.csv'  # Archivo con insumos totales
 ingredients_abc = 'ingredients_abc.csv'  # Archivo del análisis ABC
 
@@ -116,3 +128,6 @@ calculate_total_ingredients(sales_file, output_file, insumos_totales)
 
 # Análisis ABC de ingredientes
 abc_analysis_ingredients(insumos_totales, ingredients_abc)
+
+# Exportar el perfilado de etapas (solo si IO_TPI_PROFILE está definida)
+profiling.export()
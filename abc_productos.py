@@ -1,6 +1,8 @@
 import os
 import pandas as pd
 from utils import load_and_clean_data
+import profiling
+import backend_duckdb
 
 def clean_sales_data(input_file, output_file):
     """
@@ -29,7 +31,8 @@ def abc_analysis(data, output_file):
     según su demanda medida.
 
     Parámetros:
-    - data: pd.DataFrame, datos de ventas limpios.
+    - data: pd.DataFrame, datos de ventas limpios, o ventas en parquet particionado
+      (FuenteParticionada o ruta), que se agregan con DuckDB sin cargarlas en memoria.
     - output_file: str, archivo CSV  donde se guarda el resultado del análisis.
 
     Devuelve:
@@ -40,8 +43,12 @@ def abc_analysis(data, output_file):
         return pd.read_csv(output_file)
     
     # Realizar análisis ABC: calcular la demanda medida y ordenar los productos
-    data['MeasuredDemand'] = data['Quantity'] * data['unit_price']
-    data = data.groupby(['article'])['MeasuredDemand'].sum().reset_index()
+    if backend_duckdb.es_fuente_particionada(data):
+        data = backend_duckdb.demanda_por_articulo(data)
+    else:
+        with profiling.stage('abc_analysis_groupby', filas=len(data)):
+            data['MeasuredDemand'] = data['Quantity'] * data['unit_price']
+            data = data.groupby(['article'])['MeasuredDemand'].sum().reset_index()
     data = data.sort_values(by=['MeasuredDemand'], ascending=False)
     
     # Calcular porcentajes y categorización
@@ -93,9 +100,13 @@ input_file = 'Bakery sales.csv'
 cleaned_file = 'clean_sales_data.csv'
 abc_result_file = 'abc_analysis_result.csv'
 class_a_file = 'class_a_products.txt'
+sales_parquet_dir = None  # Carpeta con las ventas en parquet particionado (backend_duckdb.particionar_ventas)
 
-# Limpieza de datos
-cleaned_data = clean_sales_data(input_file, cleaned_file)
+# Limpieza de datos (con ventas particionadas se agregan directamente los parquet)
+if sales_parquet_dir:
+    cleaned_data = backend_duckdb.FuenteParticionada(sales_parquet_dir)
+else:
+    cleaned_data = clean_sales_data(input_file, cleaned_file)
 
 # Análisis ABC
 abc_result = abc_analysis(cleaned_data, abc_result_file)
@@ -106,4 +117,7 @@ if not class_a_products:
     class_a_products = save_class_a_products(abc_result, class_a_file)
 
 # Mostrar los productos de clase A
-print("Productos de clase A:", class_a_products)
\ No newline at end of file
+print("Productos de clase A:", class_a_products)
+
+# Exportar el perfilado de etapas (solo si IO_TPI_PROFILE está definida)
+profiling.export()
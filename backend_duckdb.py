@@ -0,0 +1,231 @@
+import os
+import sys
+import shutil
+import tempfile
+import pandas as pd
+import profiling
+
+try:
+    import duckdb
+except ImportError:  # backend opcional: sin duckdb se sigue usando pandas
+    duckdb = None
+
+# Etiqueta de cada período igual a la de pd.Grouper(key='date', freq=...):
+# el día, el domingo que cierra la semana (W-SUN), el fin de mes y el fin de trimestre.
+ETIQUETAS_PERIODO = {
+    'D': "CAST(date AS DATE)",
+    'W': "CAST(date_trunc('week', date) + INTERVAL 6 DAY AS DATE)",
+    'M': "last_day(date)",
+    'Q': "CAST(date_trunc('quarter', date) + INTERVAL 3 MONTH - INTERVAL 1 DAY AS DATE)",
+}
+
+
+def _literal(texto):
+    """Cadena SQL entre comillas simples."""
+    return "'" + str(texto).replace("'", "''") + "'"
+
+
+def _conectar(memory_limit=None, temp_directory=None, threads=None):
+    """Conexión en memoria; lo que no entra en `memory_limit` se vuelca a `temp_directory`."""
+    if duckdb is None:
+        raise ImportError("El backend particionado requiere el paquete 'duckdb' (pip install duckdb).")
+    config = {'preserve_insertion_order': False}
+    if memory_limit:
+        config['memory_limit'] = memory_limit
+    if temp_directory:
+        config['temp_directory'] = temp_directory
+    if threads:
+        config['threads'] = threads
+    return duckdb.connect(database=':memory:', config=config)
+
+
+class FuenteParticionada:
+    """
+    Ventas limpias guardadas en archivos parquet particionados (estilo hive, ver particionar_ventas).
+
+    Las agregaciones sobre la fuente se ejecutan con DuckDB leyendo los archivos por partes,
+    así que el historial completo no necesita entrar en memoria.
+
+    Parámetros:
+    - ruta: str, carpeta con los parquet particionados (o un archivo/patrón .parquet).
+    - articulos: lista opcional de productos a los que se restringen las consultas.
+    - memory_limit: str, memoria máxima de DuckDB (por ejemplo '4GB').
+    - temp_directory: str, carpeta donde DuckDB vuelca lo que no entra en memoria.
+    - threads: int, hilos de DuckDB (por defecto todos los núcleos).
+    """
+
+    def __init__(self, ruta, articulos=None, memory_limit=None, temp_directory=None, threads=None):
+        self.ruta = ruta
+        self.articulos = None if articulos is None else list(articulos)
+        self.memory_limit = memory_limit
+        self.temp_directory = temp_directory
+        self.threads = threads
+
+    def filtrar(self, articulos):
+        """Devuelve la misma fuente restringida a `articulos` (equivale a data[data['article'].isin(articulos)])."""
+        return FuenteParticionada(self.ruta, articulos, self.memory_limit, self.temp_directory, self.threads)
+
+    @property
+    def patron(self):
+        if os.path.isdir(self.ruta):
+            return os.path.join(self.ruta, '**', '*.parquet')
+        return self.ruta
+
+    def consultar(self, consulta):
+        """
+        Ejecuta una consulta en la que `ventas` es la tabla de ventas de la fuente.
+
+        Devuelve:
+        - pd.DataFrame con el resultado.
+        """
+        with _conectar(self.memory_limit, self.temp_directory, self.threads) as con:
+            ventas = f"read_parquet({_literal(self.patron)}, hive_partitioning = true)"
+            if self.articulos is not None:
+                con.register('articulos_filtro', pd.DataFrame({'article': self.articulos}))
+                ventas = f"(SELECT * FROM {ventas} WHERE article IN (SELECT article FROM articulos_filtro))"
+            return con.execute(consulta.format(ventas=ventas)).df()
+
+
+def es_fuente_particionada(data):
+    """True si `data` es una FuenteParticionada o la ruta a una carpeta/archivo parquet."""
+    if isinstance(data, FuenteParticionada):
+        return True
+    if isinstance(data, (str, os.PathLike)):
+        ruta = os.fspath(data)
+        return os.path.isdir(ruta) or ruta.endswith('.parquet')
+    return False
+
+
+def como_fuente(data):
+    """Convierte una ruta en FuenteParticionada (las fuentes se devuelven tal cual)."""
+    return data if isinstance(data, FuenteParticionada) else FuenteParticionada(os.fspath(data))
+
+
+def _transcodificar(input_file, carpeta=None, tam_bloque=1 << 24):
+    """
+    Copia el CSV a un archivo temporal en UTF-8, leyéndolo como ISO-8859-1 por bloques.
+
+    DuckDB rechaza como latin-1 los bytes 0x80-0x9F (por ejemplo el "€" en UTF-8 o en cp1252),
+    que pandas acepta; al decodificar como ISO-8859-1 cada byte pasa a un carácter, igual que en
+    utils.load_and_clean_data, y la expresión regular del precio descarta el símbolo.
+
+    Devuelve:
+    - str, ruta del archivo temporal (lo borra quien llama).
+    """
+    with open(input_file, encoding='ISO-8859-1', newline='') as entrada, \
+            tempfile.NamedTemporaryFile('w', encoding='utf-8', newline='', suffix='.csv', dir=carpeta, delete=False) as salida:
+        shutil.copyfileobj(entrada, salida, tam_bloque)
+    return salida.name
+
+
+def particionar_ventas(input_file, output_dir, particiones=('anio',), memory_limit=None, temp_directory=None):
+    """
+    Limpia el CSV de ventas original y lo guarda como parquet particionado, sin cargarlo en pandas.
+
+    Aplica la misma limpieza que utils.load_and_clean_data (símbolos fuera del precio unitario,
+    coma decimal, fechas y filtro de cantidades y precios positivos) y agrega MeasuredDemand.
+    El CSV se lee como ISO-8859-1, igual que en pandas (ver _transcodificar).
+
+    Parámetros:
+    - input_file: str, CSV de ventas original (ISO-8859-1).
+    - output_dir: str, carpeta de salida (una subcarpeta por valor de cada partición).
+    - particiones: columnas de partición; 'anio' se calcula a partir de la fecha y el resto
+      (por ejemplo una columna de local) debe existir en el CSV.
+    - memory_limit, temp_directory: ver FuenteParticionada.
+
+    Devuelve:
+    - FuenteParticionada sobre la carpeta generada.
+    """
+    with profiling.stage('particionar_ventas', archivo=input_file):
+        utf8 = _transcodificar(input_file, temp_directory)
+        try:
+            with _conectar(memory_limit, temp_directory) as con:
+                con.execute(f"""
+                    COPY (
+                        SELECT *, Quantity * unit_price AS MeasuredDemand, year(date) AS anio
+                        FROM (
+                            SELECT * REPLACE (
+                                CAST(date AS DATE) AS date,
+                                TRY_CAST(Quantity AS DOUBLE) AS Quantity,
+                                CAST(replace(regexp_replace(unit_price, '[^0-9,.-]', '', 'g'), ',', '.') AS DOUBLE) AS unit_price
+                            )
+                            FROM read_csv({_literal(utf8)}, header = true, all_varchar = true)
+                        )
+                        WHERE Quantity > 0 AND unit_price > 0
+                    ) TO {_literal(output_dir)} (FORMAT PARQUET, PARTITION_BY ({', '.join(particiones)}), OVERWRITE_OR_IGNORE true)
+                """)
+        finally:
+            os.remove(utf8)
+    print(f'Ventas particionadas guardadas en: {output_dir}')
+    return FuenteParticionada(output_dir, memory_limit=memory_limit, temp_directory=temp_directory)
+
+
+def demanda_por_articulo(data):
+    """
+    Demanda medida total por producto (equivale al groupby de abc_analysis).
+
+    Devuelve:
+    - pd.DataFrame con columnas 'article' y 'MeasuredDemand'.
+    """
+    fuente = como_fuente(data)
+    with profiling.stage('abc_analysis_duckdb', archivo=fuente.ruta):
+        return fuente.consultar("""
+            SELECT article, SUM(Quantity * unit_price) AS MeasuredDemand
+            FROM {ventas}
+            GROUP BY article
+            ORDER BY article
+        """)
+
+
+def cantidades_por_articulo(data, articulos):
+    """
+    Cantidad total vendida de cada producto de `articulos` (equivale al groupby de calculate_total_ingredients).
+
+    Devuelve:
+    - pd.Series con índice 'article'.
+    """
+    fuente = como_fuente(data).filtrar(articulos)
+    with profiling.stage('calculate_total_ingredients_duckdb', archivo=fuente.ruta):
+        resultado = fuente.consultar("""
+            SELECT article, SUM(Quantity) AS Quantity
+            FROM {ventas}
+            GROUP BY article
+            ORDER BY article
+        """)
+    return resultado.set_index('article')['Quantity']
+
+
+def series_por_articulo(data, freq='D'):
+    """
+    Series de demanda medida por producto (mismo formato que create_time_series).
+
+    La agregación por período se hace en DuckDB; en pandas sólo queda la tabla
+    (períodos x productos), que es chica frente a las ventas.
+
+    Devuelve:
+    - pd.DataFrame con columna 'date' y una columna por producto.
+    """
+    if freq not in ETIQUETAS_PERIODO:
+        raise ValueError(f"Frecuencia no soportada: {freq}. Opciones: {', '.join(ETIQUETAS_PERIODO)}.")
+    fuente = como_fuente(data)
+    with profiling.stage('create_time_series_duckdb', archivo=fuente.ruta, freq=freq):
+        agrupado = fuente.consultar(f"""
+            SELECT article, {ETIQUETAS_PERIODO[freq]} AS date, SUM(Quantity * unit_price) AS MeasuredDemand
+            FROM {{ventas}}
+            GROUP BY ALL
+        """)
+
+    agrupado['date'] = pd.to_datetime(agrupado['date'])
+    all_days = pd.date_range(agrupado['date'].min(), agrupado['date'].max(), freq=freq)
+    tabla = agrupado.pivot(index='date', columns='article', values='MeasuredDemand')
+    tabla = tabla.reindex(all_days).fillna(0)
+    tabla.index.name = 'date'
+    tabla.columns.name = None
+    return tabla.reset_index()
+
+
+if __name__ == "__main__":
+    # Uso: python backend_duckdb.py "Bakery sales.csv" ventas_parquet
+    particionar_ventas(sys.argv[1] if len(sys.argv) > 1 else 'Bakery sales.csv',
+                       sys.argv[2] if len(sys.argv) > 2 else 'ventas_parquet')
+    profiling.export()
@@ -0,0 +1,166 @@
+import os
+import json
+import numpy as np
+import pandas as pd
+import profiling
+
+# Frecuencias derivadas del grano diario. Las semanas van de lunes a domingo (W-SUN), que
+# son las mismas que usan pd.Grouper(freq='W') y to_period('W'); sólo cambia la etiqueta.
+FRECUENCIAS = {'D': 'D', 'W': 'W-SUN', 'M': 'M', 'Q': 'Q-DEC'}
+MEDIDAS = ('Quantity', 'MeasuredDemand')
+
+
+class CuboSeries:
+    """
+    Cubo de series de tiempo: ventas agregadas una sola vez al grano diario y acumuladas
+    en semanas, meses y trimestres para productos e insumos con el mismo calendario.
+
+    Cada frecuencia se guarda como una matriz (períodos x artículos) por medida. En disco cada
+    matriz es un .npy que se abre con memory-map, así que consultar una frecuencia, un
+    artículo o un rango de fechas no requiere leer el cubo completo.
+
+    Parámetros:
+    - articulos: list, nombres de productos (columnas de las matrices de productos).
+    - insumos: list, nombres de insumos (columnas de las matrices de insumos).
+    - inicios: dict frecuencia -> np.ndarray datetime64[D] con el inicio de cada período.
+    - matrices: dict (frecuencia, medida) -> np.ndarray (períodos, artículos o insumos).
+    """
+
+    def __init__(self, articulos, insumos, inicios, matrices):
+        self.articulos = list(articulos)
+        self.insumos = list(insumos)
+        self.inicios = inicios
+        self.matrices = matrices
+        self._pos_articulos = {a: i for i, a in enumerate(self.articulos)}
+        self._pos_insumos = {a: i for i, a in enumerate(self.insumos)}
+
+    @classmethod
+    def construir(cls, data, ingredient_data=None):
+        """
+        Construye el cubo a partir de las ventas limpias.
+
+        Parámetros:
+        - data: pd.DataFrame con columnas 'date', 'article', 'Quantity' y opcionalmente
+          'MeasuredDemand' (si falta se calcula como Quantity * unit_price).
+        - ingredient_data: pd.DataFrame opcional, insumos por unidad de producto
+          (índice: producto, columnas: insumos), como cleaned_ingredient_data.csv.
+
+        Devuelve:
+        - CuboSeries.
+        """
+        with profiling.stage('construir_cubo', filas=len(data)):
+            if 'MeasuredDemand' not in data:
+                data = data.assign(MeasuredDemand=data['Quantity'] * data['unit_price'])
+
+            # Grano diario: una única pasada sobre las ventas
+            dias = pd.to_datetime(data['date']).dt.normalize()
+            primer_dia, ultimo_dia = dias.min(), dias.max()
+            fechas = pd.date_range(primer_dia, ultimo_dia, freq='D')
+            articulos = pd.Categorical(data['article'])
+            n_dias, n_articulos = len(fechas), len(articulos.categories)
+            posicion = (dias - primer_dia).dt.days.to_numpy() * n_articulos + articulos.codes
+
+            diario = {
+                medida: np.bincount(posicion, weights=data[medida].to_numpy(dtype=np.float64),
+                                    minlength=n_dias * n_articulos).reshape(n_dias, n_articulos)
+                for medida in MEDIDAS
+            }
+
+            # Recetas alineadas con los productos del cubo (productos sin receta aportan cero)
+            if ingredient_data is not None:
+                insumos = list(ingredient_data.columns)
+                receta = ingredient_data.reindex(articulos.categories).fillna(0).to_numpy(dtype=np.float64)
+            else:
+                insumos, receta = [], None
+
+            inicios, matrices = {}, {}
+            for frecuencia, alias in FRECUENCIAS.items():
+                periodos = fechas.to_period(alias)
+                cortes = np.flatnonzero(np.r_[True, periodos[1:] != periodos[:-1]])
+                inicios[frecuencia] = periodos[cortes].start_time.to_numpy().astype('datetime64[D]')
+                for medida in MEDIDAS:
+                    matrices[(frecuencia, medida)] = np.add.reduceat(diario[medida], cortes, axis=0)
+                if receta is not None:
+                    matrices[(frecuencia, 'Insumos')] = matrices[(frecuencia, 'Quantity')] @ receta
+
+        return cls(articulos.categories, insumos, inicios, matrices)
+
+    def guardar(self, carpeta):
+        """Guarda el cubo en una carpeta (un .npy por matriz y un meta.json)."""
+        os.makedirs(carpeta, exist_ok=True)
+        for frecuencia, inicios in self.inicios.items():
+            np.save(os.path.join(carpeta, f'{frecuencia}_inicios.npy'), inicios)
+        for (frecuencia, medida), matriz in self.matrices.items():
+            np.save(os.path.join(carpeta, f'{frecuencia}_{medida}.npy'), matriz)
+        meta = {
+            'articulos': self.articulos,
+            'insumos': self.insumos,
+            'frecuencias': list(self.inicios),
+            'matrices': [list(clave) for clave in self.matrices],
+        }
+        with open(os.path.join(carpeta, 'meta.json'), 'w', encoding='utf-8') as f:
+            json.dump(meta, f, ensure_ascii=False)
+        print(f'Cubo de series guardado en: {carpeta}')
+
+    @classmethod
+    def cargar(cls, carpeta, mmap=True):
+        """
+        Abre un cubo guardado. Con mmap=True las matrices no se leen hasta que se consultan.
+        """
+        with open(os.path.join(carpeta, 'meta.json'), 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+        modo = 'r' if mmap else None
+        inicios = {frecuencia: np.load(os.path.join(carpeta, f'{frecuencia}_inicios.npy')) for frecuencia in meta['frecuencias']}
+        matrices = {
+            (frecuencia, medida): np.load(os.path.join(carpeta, f'{frecuencia}_{medida}.npy'), mmap_mode=modo)
+            for frecuencia, medida in meta['matrices']
+        }
+        return cls(meta['articulos'], meta['insumos'], inicios, matrices)
+
+    def _rango(self, freq, inicio, fin):
+        inicios = self.inicios[freq]
+        desde = 0 if inicio is None else np.searchsorted(inicios, np.datetime64(pd.Timestamp(inicio).to_period(FRECUENCIAS[freq]).start_time, 'D'))
+        hasta = len(inicios) if fin is None else np.searchsorted(inicios, np.datetime64(pd.Timestamp(fin), 'D'), side='right')
+        return slice(desde, hasta)
+
+    def _etiquetas(self, freq, filas, etiqueta):
+        periodos = pd.DatetimeIndex(self.inicios[freq][filas]).to_period(FRECUENCIAS[freq])
+        if etiqueta == 'inicio':
+            return periodos.start_time
+        return periodos.end_time.normalize()
+
+    def serie(self, freq='W', medida='MeasuredDemand', articulos=None, inicio=None, fin=None, etiqueta='fin'):
+        """
+        Devuelve las series de productos para una frecuencia, medida, artículos y rango de fechas.
+
+        Parámetros:
+        - freq: str, 'D', 'W', 'M' o 'Q'.
+        - medida: str, 'Quantity' o 'MeasuredDemand'.
+        - articulos: list, productos a incluir (por defecto todos).
+        - inicio, fin: fechas opcionales; se incluyen los períodos que comienzan en el rango.
+        - etiqueta: str, 'fin' (fecha de cierre del período, como pd.Grouper) o 'inicio'
+          (fecha de comienzo, como to_period(...).start_time).
+
+        Devuelve:
+        - pd.DataFrame con índice 'date' y una columna por producto.
+        """
+        columnas = self.articulos if articulos is None else list(articulos)
+        posiciones = [self._pos_articulos[a] for a in columnas]
+        filas = self._rango(freq, inicio, fin)
+        valores = np.asarray(self.matrices[(freq, medida)][filas][:, posiciones])
+        return pd.DataFrame(valores, index=pd.Index(self._etiquetas(freq, filas, etiqueta), name='date'), columns=columnas)
+
+    def serie_insumos(self, freq='W', insumos=None, inicio=None, fin=None, etiqueta='inicio'):
+        """
+        Devuelve las series de insumos utilizados (cantidad vendida x receta).
+
+        Parámetros: ver serie; `insumos` es la lista de insumos a incluir.
+
+        Devuelve:
+        - pd.DataFrame con índice 'date' y una columna por insumo.
+        """
+        columnas = self.insumos if insumos is None else list(insumos)
+        posiciones = [self._pos_insumos[i] for i in columnas]
+        filas = self._rango(freq, inicio, fin)
+        valores = np.asarray(self.matrices[(freq, 'Insumos')][filas][:, posiciones])
+        return pd.DataFrame(valores, index=pd.Index(self._etiquetas(freq, filas, etiqueta), name='date'), columns=columnas)
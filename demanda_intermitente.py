@@ -0,0 +1,215 @@
+import numpy as np
+import pandas as pd
+import profiling
+from utils import fechas_pronostico
+
+# Umbrales de Syntetos-Boylan para clasificar la demanda
+UMBRAL_ADI = 1.32
+UMBRAL_CV2 = 0.49
+
+
+def clasificar_demanda(data):
+    """
+    Clasifica cada serie según el intervalo medio entre demandas (ADI) y la variabilidad
+    de los tamaños no nulos (CV²), con los umbrales de Syntetos-Boylan.
+
+    Parámetros:
+    - data: pd.DataFrame, una columna por serie (fechas en el índice).
+
+    Devuelve:
+    - pd.DataFrame con ADI, CV2, Proporcion_Ceros, Categoria ('suave', 'erratica',
+      'intermitente', 'irregular' o 'sin_demanda') y Es_Intermitente, una fila por serie.
+    """
+    valores = data.fillna(0).to_numpy(dtype=np.float64)
+    positivos = valores > 0  # mismo criterio que SerieDispersa.desde_serie
+    n_positivos = positivos.sum(axis=0)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        adi = len(valores) / n_positivos
+        tamanos = np.where(positivos, valores, np.nan)
+        cv2 = np.nanvar(tamanos, axis=0) / np.nanmean(tamanos, axis=0) ** 2
+
+    categoria = np.select(
+        [n_positivos == 0, (adi < UMBRAL_ADI) & (cv2 < UMBRAL_CV2), adi < UMBRAL_ADI, cv2 < UMBRAL_CV2],
+        ['sin_demanda', 'suave', 'erratica', 'intermitente'],
+        default='irregular',
+    )
+    return pd.DataFrame({
+        'ADI': adi,
+        'CV2': cv2,
+        'Proporcion_Ceros': 1 - n_positivos / len(valores),
+        'Categoria': categoria,
+        'Es_Intermitente': (adi >= UMBRAL_ADI) | (n_positivos == 0),
+    }, index=data.columns)
+
+
+class SerieDispersa:
+    """
+    Serie guardada sólo con las posiciones y valores no nulos.
+
+    Parámetros:
+    - indices: np.ndarray int32, posiciones con demanda.
+    - valores: np.ndarray float64, demanda en esas posiciones.
+    - fechas: pd.DatetimeIndex, índice completo de la serie.
+    - nombre: str, nombre de la serie.
+    """
+    __slots__ = ('indices', 'valores', 'fechas', 'nombre')
+
+    def __init__(self, indices, valores, fechas, nombre=None):
+        self.indices = indices
+        self.valores = valores
+        self.fechas = fechas
+        self.nombre = nombre
+
+    @classmethod
+    def desde_serie(cls, series):
+        """Crea la versión dispersa de una pd.Series (sólo las demandas positivas, como en clasificar_demanda)."""
+        valores = series.fillna(0).to_numpy(dtype=np.float64)
+        indices = np.flatnonzero(valores > 0).astype(np.int32)
+        return cls(indices, valores[indices], series.index, series.name)
+
+    def a_serie(self):
+        """Reconstruye la pd.Series densa."""
+        valores = np.zeros(len(self.fechas))
+        valores[self.indices] = self.valores
+        return pd.Series(valores, index=self.fechas, name=self.nombre)
+
+    @property
+    def nbytes(self):
+        """Memoria usada por los datos de la serie (sin el índice de fechas compartido)."""
+        return self.indices.nbytes + self.valores.nbytes
+
+
+def enrutar_series(data, clasificacion=None):
+    """
+    Separa las series densas (para SARIMA) de las intermitentes, que se guardan dispersas.
+
+    Parámetros:
+    - data: pd.DataFrame, una columna por serie.
+    - clasificacion: pd.DataFrame opcional, resultado de clasificar_demanda.
+
+    Devuelve:
+    - tuple (pd.DataFrame de series densas, dict nombre -> SerieDispersa).
+    """
+    if clasificacion is None:
+        clasificacion = clasificar_demanda(data)
+    intermitentes = clasificacion.index[clasificacion['Es_Intermitente']]
+    dispersas = {columna: SerieDispersa.desde_serie(data[columna]) for columna in intermitentes}
+    return data.drop(columns=intermitentes), dispersas
+
+
+def nivel_intermitente(serie, metodo='sba', alfa=0.1, beta=0.1):
+    """
+    Estima la demanda media por período de una serie dispersa con Croston, SBA o TSB.
+
+    Los tres métodos se calculan recorriendo sólo las demandas no nulas: Croston y SBA
+    actualizan tamaño e intervalo en cada demanda, y en TSB la probabilidad de demanda
+    decae geométricamente durante cada racha de ceros, (1 - β)^k, en forma cerrada.
+
+    Parámetros:
+    - serie: SerieDispersa.
+    - metodo: str, 'croston', 'sba' o 'tsb'.
+    - alfa: float, suavizado del tamaño de la demanda.
+    - beta: float, suavizado del intervalo (Croston/SBA) o de la probabilidad (TSB).
+
+    Devuelve:
+    - float, demanda esperada por período.
+    """
+    if len(serie.indices) == 0:
+        return 0.0
+
+    intervalos = np.diff(np.concatenate([[-1], serie.indices]))
+    tamano = serie.valores[0]
+
+    if metodo == 'tsb':
+        probabilidad = 1.0 / intervalos[0]
+        for intervalo, valor in zip(intervalos[1:], serie.valores[1:]):
+            probabilidad = probabilidad * (1 - beta) ** (intervalo - 1)  # racha de ceros
+            probabilidad += beta * (1 - probabilidad)
+            tamano += alfa * (valor - tamano)
+        ceros_finales = len(serie.fechas) - 1 - serie.indices[-1]
+        probabilidad *= (1 - beta) ** ceros_finales
+        return probabilidad * tamano
+
+    if metodo not in ('croston', 'sba'):
+        raise ValueError(f"Método desconocido: {metodo}. Opciones: 'croston', 'sba', 'tsb'.")
+    intervalo_medio = float(intervalos[0])
+    for intervalo, valor in zip(intervalos[1:], serie.valores[1:]):
+        tamano += alfa * (valor - tamano)
+        intervalo_medio += beta * (intervalo - intervalo_medio)
+    nivel = tamano / intervalo_medio
+    return nivel * (1 - beta / 2) if metodo == 'sba' else nivel
+
+
+def pronosticar_intermitentes(dispersas, steps=48, metodo='sba', alfa=0.1, beta=0.1):
+    """
+    Pronostica todas las series intermitentes (pronóstico plano con el nivel estimado).
+
+    Parámetros:
+    - dispersas: dict nombre -> SerieDispersa.
+    - steps: int, períodos a pronosticar.
+    - metodo, alfa, beta: ver nivel_intermitente.
+
+    Devuelve:
+    - pd.DataFrame con una columna por serie.
+    """
+    if not dispersas:
+        return pd.DataFrame()
+    with profiling.stage('pronosticar_intermitentes', filas=sum(len(s.indices) for s in dispersas.values())):
+        niveles = {nombre: nivel_intermitente(serie, metodo, alfa, beta) for nombre, serie in dispersas.items()}
+    futuras = fechas_pronostico(next(iter(dispersas.values())).fechas, steps)
+    return pd.DataFrame(np.tile(list(niveles.values()), (steps, 1)), index=futuras, columns=list(niveles))
+
+
+def guardar_dispersas(dispersas, output_path):
+    """Guarda las series dispersas en un único .npz (índices y valores concatenados)."""
+    nombres = list(dispersas)
+    largos = np.array([len(dispersas[n].indices) for n in nombres])
+    np.savez_compressed(
+        output_path,
+        nombres=np.array(nombres),
+        desplazamientos=np.concatenate([[0], np.cumsum(largos)]),
+        indices=np.concatenate([dispersas[n].indices for n in nombres]) if nombres else np.array([], dtype=np.int32),
+        valores=np.concatenate([dispersas[n].valores for n in nombres]) if nombres else np.array([]),
+        fechas=next(iter(dispersas.values())).fechas.to_numpy() if nombres else np.array([], dtype='datetime64[ns]'),
+    )
+    print(f'Series dispersas guardadas en: {output_path}')
+
+
+def cargar_dispersas(input_path):
+    """Carga las series guardadas con guardar_dispersas."""
+    with np.load(input_path, allow_pickle=False) as datos:
+        fechas = pd.DatetimeIndex(datos['fechas'])
+        d = datos['desplazamientos']
+        return {
+            str(nombre): SerieDispersa(datos['indices'][d[i]:d[i + 1]], datos['valores'][d[i]:d[i + 1]], fechas, str(nombre))
+            for i, nombre in enumerate(datos['nombres'])
+        }
+
+
+def main():
+    """
+    Clasifica las series de productos, guarda las intermitentes en formato disperso y las pronostica.
+    """
+    data = pd.read_csv('products_time_series.csv', index_col='date', parse_dates=True)
+    clasificacion = clasificar_demanda(data)
+    clasificacion.to_csv('products_demand_classification.csv')
+    print(clasificacion[['ADI', 'CV2', 'Categoria']])
+
+    densas, dispersas = enrutar_series(data, clasificacion)
+    if not dispersas:
+        print('No hay series intermitentes.')
+        return
+    memoria_densa = data[list(dispersas)].to_numpy().nbytes
+    memoria_dispersa = sum(s.nbytes for s in dispersas.values())
+    print(f'{len(dispersas)} series intermitentes: {memoria_densa} bytes densas, {memoria_dispersa} bytes dispersas.')
+
+    guardar_dispersas(dispersas, 'products_intermittent.npz')
+    pronosticos = pronosticar_intermitentes(dispersas, steps=48)
+    pronosticos.to_csv('products_intermittent_forecasts.csv', encoding='utf-8-sig')
+    print('Pronósticos intermitentes guardados en: products_intermittent_forecasts.csv')
+
+
+if __name__ == "__main__":
+    main()
+    profiling.export()
@@ -0,0 +1,221 @@
+import os
+import re
+import json
+import hashlib
+import numpy as np
+import pandas as pd
+import profiling
+
+SEMANAS_ANIO = 52
+
+
+def load_weekly_ingredients(filepath):
+    """Carga las series semanales de insumos (una columna por insumo, índice semanal)."""
+    return pd.read_csv(filepath, index_col=0, parse_dates=True, encoding='utf-8-sig')
+
+
+def nombre_insumo(columna):
+    """Quita la unidad del nombre de la columna: 'Harina de Trigo (g)' -> 'Harina de Trigo'."""
+    return re.sub(r'\s*\(.*\)\s*$', '', columna)
+
+
+def _huella(data):
+    """Hash del contenido de un DataFrame, usado para detectar si cambiaron semanas ya procesadas."""
+    valores = np.ascontiguousarray(data.to_numpy(dtype=np.float64))
+    indice = data.index.astype('int64').to_numpy()
+    return hashlib.sha1(valores.tobytes() + indice.tobytes()).hexdigest()
+
+
+def _estado_vacio(columnas):
+    return {
+        "columnas": list(columnas),
+        "ultima_semana": None,
+        "huella": None,
+        "conteo": [0] * SEMANAS_ANIO,
+        "suma": [[0.0] * len(columnas) for _ in range(SEMANAS_ANIO)],
+        "suma_cuadrados": [[0.0] * len(columnas) for _ in range(SEMANAS_ANIO)],
+    }
+
+
+def actualizar_estadisticas(estado, data):
+    """
+    Incorpora al estado las semanas de `data` posteriores a la última procesada.
+
+    El estado guarda, por semana del año (1 a 52), la cantidad de observaciones, la suma
+    y la suma de cuadrados de cada insumo. Con eso alcanza para recalcular medias y desvíos
+    de cualquier temporada sin volver a leer la historia completa. Si cambian las columnas
+    o las semanas ya procesadas, el estado se reconstruye desde cero.
+
+    Parámetros:
+    - estado: dict o None, estado previo (ver _estado_vacio).
+    - data: pd.DataFrame, series semanales de insumos.
+
+    Devuelve:
+    - dict, estado actualizado.
+    """
+    data = data.sort_index()
+    if estado is not None and estado["ultima_semana"] is not None:
+        procesadas = data[data.index <= pd.Timestamp(estado["ultima_semana"])]
+        if estado["columnas"] != list(data.columns) or _huella(procesadas) != estado["huella"]:
+            estado = None
+    if estado is None:
+        estado = _estado_vacio(data.columns)
+
+    nuevas = data if estado["ultima_semana"] is None else data[data.index > pd.Timestamp(estado["ultima_semana"])]
+    if nuevas.empty:
+        return estado
+
+    # Acumular por semana del año en una sola pasada (la semana 53 se une a la 52)
+    semanas = np.minimum(nuevas.index.isocalendar().week.to_numpy(), SEMANAS_ANIO) - 1
+    valores = nuevas.to_numpy(dtype=np.float64)
+    conteo = np.asarray(estado["conteo"], dtype=np.int64)
+    suma = np.asarray(estado["suma"], dtype=np.float64)
+    suma_cuadrados = np.asarray(estado["suma_cuadrados"], dtype=np.float64)
+    np.add.at(conteo, semanas, 1)
+    np.add.at(suma, semanas, valores)
+    np.add.at(suma_cuadrados, semanas, valores ** 2)
+
+    estado["conteo"] = conteo.tolist()
+    estado["suma"] = suma.tolist()
+    estado["suma_cuadrados"] = suma_cuadrados.tolist()
+    estado["ultima_semana"] = nuevas.index[-1].isoformat()
+    estado["huella"] = _huella(data)
+    return estado
+
+
+def segmentar(perfil, n_temporadas=4, largo_minimo=4, penalizacion=None):
+    """
+    Divide un perfil semanal (semanas x insumos) en tramos contiguos con media constante.
+
+    Usa particionamiento óptimo por programación dinámica. El costo de cada tramo es la
+    suma de errores cuadráticos respecto de su media, sumada sobre todos los insumos
+    (previamente estandarizados). Los costos de todos los tramos se calculan de una vez con
+    sumas acumuladas, y cada paso de la programación dinámica es una única operación vectorizada.
+
+    Parámetros:
+    - perfil: np.ndarray (semanas, insumos).
+    - n_temporadas: int, cantidad de temporadas (None la elige con la penalización).
+    - largo_minimo: int, semanas mínimas por temporada.
+    - penalizacion: float, costo por temporada adicional cuando n_temporadas es None
+      (por defecto 2 * insumos * log(semanas)).
+
+    Devuelve:
+    - list de int, índices de inicio de cada temporada (el primero siempre es 0).
+    """
+    x = (perfil - perfil.mean(axis=0)) / np.where(perfil.std(axis=0) > 0, perfil.std(axis=0), 1)
+    n = len(x)
+
+    # Costo de todos los tramos [i, j) a partir de sumas acumuladas
+    s1 = np.vstack([np.zeros(x.shape[1]), np.cumsum(x, axis=0)])
+    s2 = np.concatenate([[0.0], np.cumsum((x ** 2).sum(axis=1))])
+    largo = (np.arange(n + 1)[None, :] - np.arange(n + 1)[:, None]).astype(np.float64)
+    diferencia = s1[None, :, :] - s1[:, None, :]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        costo = (s2[None, :] - s2[:, None]) - (diferencia ** 2).sum(axis=2) / largo
+    costo[largo < largo_minimo] = np.inf
+
+    max_temporadas = n_temporadas or n // largo_minimo
+    optimo = np.full((max_temporadas + 1, n + 1), np.inf)
+    previo = np.zeros((max_temporadas + 1, n + 1), dtype=np.int64)
+    optimo[0, 0] = 0.0
+    for k in range(1, max_temporadas + 1):
+        candidatos = optimo[k - 1][:, None] + costo
+        previo[k] = np.argmin(candidatos, axis=0)
+        optimo[k] = candidatos[previo[k], np.arange(n + 1)]
+
+    if n_temporadas is None:
+        if penalizacion is None:
+            penalizacion = 2 * x.shape[1] * np.log(n)
+        n_temporadas = int(np.argmin(optimo[1:, n] + penalizacion * np.arange(1, max_temporadas + 1))) + 1
+
+    # Reconstruir los cortes
+    inicios = []
+    fin = n
+    for k in range(n_temporadas, 0, -1):
+        fin = previo[k, fin]
+        inicios.append(int(fin))
+    return inicios[::-1]
+
+
+def temporadas_desde_estado(estado, n_temporadas=4, largo_minimo=4, factor_unidad=0.001):
+    """
+    Detecta las temporadas y calcula la media y D.E. semanal de cada insumo en cada una.
+
+    Parámetros:
+    - estado: dict, estadísticas por semana del año (ver actualizar_estadisticas).
+    - n_temporadas: int, cantidad de temporadas (None para elegirla automáticamente).
+    - largo_minimo: int, semanas mínimas por temporada.
+    - factor_unidad: float, conversión de la unidad de las series a la de los análisis (g -> kg).
+
+    Devuelve:
+    - list de dict con el formato de parametros_inventario.temporadas, más las semanas del año
+      que abarca cada temporada ("semanas": [inicio, fin]).
+    """
+    conteo = np.asarray(estado["conteo"], dtype=np.float64)
+    suma = np.asarray(estado["suma"], dtype=np.float64) * factor_unidad
+    suma_cuadrados = np.asarray(estado["suma_cuadrados"], dtype=np.float64) * factor_unidad ** 2
+
+    # Sólo se segmentan las semanas del año con observaciones
+    observadas = np.flatnonzero(conteo > 0)
+    perfil = suma[observadas] / conteo[observadas, None]
+    inicios = segmentar(perfil, n_temporadas=n_temporadas, largo_minimo=largo_minimo)
+    limites = inicios + [len(observadas)]
+
+    temporadas = []
+    for numero, (inicio, fin) in enumerate(zip(limites[:-1], limites[1:]), start=1):
+        semanas = observadas[inicio:fin]
+        n = conteo[semanas].sum()
+        media = suma[semanas].sum(axis=0) / n
+        varianza = (suma_cuadrados[semanas].sum(axis=0) - n * media ** 2) / max(n - 1, 1)
+        de = np.sqrt(np.maximum(varianza, 0))
+        temporadas.append({
+            "nombre": str(numero),
+            "duracion_temporada": int(semanas[-1] - semanas[0] + 1),
+            "semanas": [int(semanas[0]) + 1, int(semanas[-1]) + 1],
+            "demandas": {
+                nombre_insumo(columna): {"media": round(float(m), 3), "de": round(float(d), 3)}
+                for columna, m, d in zip(estado["columnas"], media, de)
+            },
+        })
+    return temporadas
+
+
+def detectar_temporadas(filepath='weekly_ingredients.csv', cache_path='temporadas_cache.json', n_temporadas=4, largo_minimo=4):
+    """
+    Detecta las temporadas a partir de las series semanales de insumos, reutilizando el
+    estado guardado para procesar sólo las semanas nuevas.
+
+    Parámetros:
+    - filepath: str, CSV con las series semanales de insumos.
+    - cache_path: str, archivo JSON con el estado incremental (None para no usar caché).
+    - n_temporadas: int, cantidad de temporadas (None para elegirla automáticamente).
+    - largo_minimo: int, semanas mínimas por temporada.
+
+    Devuelve:
+    - list de dict con el formato de parametros_inventario.temporadas.
+    """
+    estado = None
+    if cache_path and os.path.exists(cache_path):
+        with open(cache_path, 'r', encoding='utf-8') as f:
+            estado = json.load(f)
+
+    with profiling.stage('detectar_temporadas') as etapa:
+        data = load_weekly_ingredients(filepath)
+        estado = actualizar_estadisticas(estado, data)
+        temporadas = temporadas_desde_estado(estado, n_temporadas=n_temporadas, largo_minimo=largo_minimo)
+        etapa.record(filas=len(data))
+
+    if cache_path:
+        with open(cache_path, 'w', encoding='utf-8') as f:
+            json.dump(estado, f, ensure_ascii=False)
+    return temporadas
+
+
+if __name__ == "__main__":
+    temporadas = detectar_temporadas()
+    for temporada in temporadas:
+        print(f"Temporada {temporada['nombre']}: semanas {temporada['semanas'][0]}-{temporada['semanas'][1]} "
+              f"({temporada['duracion_temporada']} semanas)")
+        for insumo, datos in temporada["demandas"].items():
+            print(f"  {insumo}: media {datos['media']}, D.E. {datos['de']}")
+    profiling.export()
@@ -0,0 +1,120 @@
+import os
+import io
+import queue
+import zipfile
+import threading
+import matplotlib.pyplot as plt
+import profiling
+
+
+class EscritorAsincrono:
+    """
+    Escribe archivos de salida (CSV, PNG) en hilos de fondo para superponer la E/S con el cálculo.
+
+    La serialización (DataFrame -> CSV, figura -> PNG) se hace en el hilo que llama, así los
+    datos y las figuras no se comparten entre hilos; sólo la escritura de bytes va a la cola.
+    La cola es acotada: si el disco no da abasto, el productor espera en lugar de acumular memoria.
+    Cada hilo toma hasta `tam_lote` archivos pendientes por vez y los escribe juntos.
+
+    Parámetros:
+    - hilos: int, cantidad de hilos de escritura.
+    - max_pendientes: int, archivos en cola antes de bloquear al productor.
+    - tam_lote: int, archivos que un hilo escribe por tanda.
+    - archivo_zip: str, si se indica, todas las salidas se agrupan en ese archivo ZIP
+      (manteniendo la ruta relativa como nombre interno) en lugar de escribirse sueltas.
+
+    Los métodos de escritura sólo encolan: los archivos están en disco recién después de cerrar().
+    Al salir del bloque `with` se relanza el primer error de escritura, salvo que ya se esté
+    propagando otra excepción (que tiene prioridad).
+
+    Uso:
+        with EscritorAsincrono() as escritor:
+            escritor.escribir_csv(df, 'salida.csv', index=False)
+    """
+
+    def __init__(self, hilos=2, max_pendientes=64, tam_lote=16, archivo_zip=None):
+        self.tam_lote = tam_lote
+        self._cola = queue.Queue(maxsize=max_pendientes)
+        self._errores = []
+        self._lock_zip = threading.Lock()
+        self._zip = zipfile.ZipFile(archivo_zip, 'w', compression=zipfile.ZIP_DEFLATED) if archivo_zip else None
+        self._hilos = [threading.Thread(target=self._trabajar, daemon=True) for _ in range(1 if self._zip else hilos)]
+        for hilo in self._hilos:
+            hilo.start()
+
+    def escribir_bytes(self, ruta, contenido):
+        """Encola el contenido para escribirlo en `ruta`."""
+        if self._errores:
+            raise self._errores[0]
+        self._cola.put((ruta, contenido))
+
+    def escribir_csv(self, df, ruta, encoding='utf-8', **kwargs):
+        """Serializa un DataFrame a CSV y encola su escritura (acepta los argumentos de DataFrame.to_csv)."""
+        self.escribir_bytes(ruta, df.to_csv(**kwargs).encode(encoding))
+
+    def guardar_figura(self, fig, ruta, **kwargs):
+        """Renderiza la figura, la cierra y encola su escritura (acepta los argumentos de Figure.savefig)."""
+        buffer = io.BytesIO()
+        fig.savefig(buffer, format=os.path.splitext(ruta)[1][1:] or 'png', **kwargs)
+        plt.close(fig)
+        self.escribir_bytes(ruta, buffer.getvalue())
+
+    def _trabajar(self):
+        while True:
+            tareas = [self._cola.get()]
+            # Cada hilo consume a lo sumo una marca de fin (None)
+            while tareas[-1] is not None and len(tareas) < self.tam_lote:
+                try:
+                    tareas.append(self._cola.get_nowait())
+                except queue.Empty:
+                    break
+
+            pendientes = [t for t in tareas if t is not None]
+            try:
+                if pendientes:
+                    with profiling.stage('escritura_salidas', filas=len(pendientes)):
+                        self._escribir(pendientes)
+            except Exception as error:
+                self._errores.append(error)
+            finally:
+                for _ in tareas:
+                    self._cola.task_done()
+
+            if tareas[-1] is None:
+                return
+
+    def _escribir(self, tareas):
+        if self._zip is not None:
+            with self._lock_zip:
+                for ruta, contenido in tareas:
+                    self._zip.writestr(os.path.normpath(ruta), contenido)
+            return
+        for ruta, contenido in tareas:
+            carpeta = os.path.dirname(ruta)
+            if carpeta:
+                os.makedirs(carpeta, exist_ok=True)
+            with open(ruta, 'wb') as f:
+                f.write(contenido)
+
+    def cerrar(self):
+        """Espera a que se escriban todos los archivos pendientes y relanza el primer error, si hubo."""
+        for _ in self._hilos:
+            self._cola.put(None)
+        for hilo in self._hilos:
+            hilo.join()
+        if self._zip is not None:
+            self._zip.close()
+        if self._errores:
+            raise self._errores[0]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, tipo, valor, traza):
+        try:
+            self.cerrar()
+        except Exception:
+            # Un error de escritura no debe ocultar la excepción que ya se está propagando
+            if tipo is None:
+                raise
+        return False
@@ -0,0 +1,120 @@
+import numpy as np
+import pandas as pd
+import profiling
+
+METRICAS = ('RMSE', 'MAE', 'MAPE', 'sMAPE', 'Bias', 'MASE', 'Cobertura')
+
+
+def _media(valores, ejes):
+    """Media ignorando NaN (ventanas u horizontes faltantes); NaN si no hay datos."""
+    validos = ~np.isnan(valores)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(validos, valores, 0).sum(axis=ejes) / validos.sum(axis=ejes)
+
+
+def escala_mase(historia, estacionalidad=1):
+    """
+    Escala del MASE de cada serie: error absoluto medio del pronóstico ingenuo
+    (y_t = y_{t-m}) dentro de la muestra.
+
+    Parámetros:
+    - historia: np.ndarray (series, períodos), puede tener NaN.
+    - estacionalidad: int, rezago m del pronóstico ingenuo.
+
+    Devuelve:
+    - np.ndarray (series,).
+    """
+    historia = np.asarray(historia, dtype=np.float64)
+    return _media(np.abs(historia[:, estacionalidad:] - historia[:, :-estacionalidad]), ejes=1)
+
+
+def calcular_metricas(reales, pronosticos, inferior=None, superior=None, escala=None, ejes=(1, 2)):
+    """
+    Calcula las métricas de error sobre arrays apilados de todas las series.
+
+    Los arrays tienen forma (series, ventanas, horizonte); las posiciones sin dato van con NaN
+    y no cuentan en las medias. Cada métrica se reduce sobre `ejes`: con (1, 2) queda una por
+    serie, con 1 una por serie y horizonte, y con 2 una por serie y ventana.
+
+    Parámetros:
+    - reales, pronosticos: np.ndarray (series, ventanas, horizonte).
+    - inferior, superior: np.ndarray opcionales con los límites del intervalo de predicción.
+    - escala: np.ndarray (series,) opcional, escala del MASE (ver escala_mase).
+    - ejes: int o tuple, ejes sobre los que se promedia.
+
+    Devuelve:
+    - dict métrica -> np.ndarray. MAPE y sMAPE en porcentaje (MAPE ignora los reales nulos),
+      Bias = media de (pronóstico - real), Cobertura = fracción de reales dentro del intervalo.
+    """
+    reales = np.asarray(reales, dtype=np.float64)
+    pronosticos = np.asarray(pronosticos, dtype=np.float64)
+    errores = pronosticos - reales
+    absolutos = np.abs(errores)
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        porcentuales = np.where(reales != 0, absolutos / np.abs(reales), np.nan)
+        simetricos = 2 * absolutos / (np.abs(reales) + np.abs(pronosticos))
+
+    metricas = {
+        'RMSE': np.sqrt(_media(errores ** 2, ejes)),
+        'MAE': _media(absolutos, ejes),
+        'MAPE': 100 * _media(porcentuales, ejes),
+        'sMAPE': 100 * _media(simetricos, ejes),
+        'Bias': _media(errores, ejes),
+    }
+    if escala is not None:
+        escala = np.asarray(escala, dtype=np.float64).reshape((-1,) + (1,) * (reales.ndim - 1))
+        with np.errstate(invalid='ignore', divide='ignore'):
+            metricas['MASE'] = _media(absolutos / escala, ejes)
+    if inferior is not None and superior is not None:
+        dentro = ((reales >= inferior) & (reales <= superior)).astype(np.float64)
+        metricas['Cobertura'] = _media(np.where(np.isnan(reales), np.nan, dentro), ejes)
+    return metricas
+
+
+def resumen_metricas(nombres, reales, pronosticos, inferior=None, superior=None, escala=None):
+    """
+    Tabla compacta con una fila por serie y una columna por métrica.
+
+    Parámetros:
+    - nombres: list, nombre de cada serie (primer eje de los arrays).
+    - Resto: ver calcular_metricas.
+
+    Devuelve:
+    - pd.DataFrame con índice 'Serie', las métricas y la cantidad de ventanas evaluadas.
+    """
+    with profiling.stage('resumen_metricas', filas=int(np.size(reales))):
+        metricas = calcular_metricas(reales, pronosticos, inferior, superior, escala)
+    resumen = pd.DataFrame(metricas, index=pd.Index(nombres, name='Serie'))
+    resumen['Ventanas'] = (~np.isnan(np.asarray(reales, dtype=np.float64))).any(axis=2).sum(axis=1)
+    return resumen[[m for m in METRICAS if m in resumen] + ['Ventanas']]
+
+
+def errores_formato_largo(nombres, fechas, reales, pronosticos, inferior=None, superior=None):
+    """
+    Errores semana a semana en formato largo (una fila por serie, ventana y horizonte con dato).
+
+    Parámetros:
+    - nombres: list, nombre de cada serie.
+    - fechas: np.ndarray datetime64 (series, ventanas, horizonte) con la semana pronosticada.
+    - Resto: ver calcular_metricas.
+
+    Devuelve:
+    - pd.DataFrame con columnas Serie, Ventana, Horizonte, Fecha, Real, Pronostico, Error
+      (y Limite Inferior/Superior si se indican).
+    """
+    reales = np.asarray(reales, dtype=np.float64)
+    serie, ventana, horizonte = np.nonzero(~np.isnan(reales))
+    largo = pd.DataFrame({
+        'Serie': np.asarray(nombres, dtype=object)[serie],
+        'Ventana': ventana,
+        'Horizonte': horizonte + 1,
+        'Fecha': np.asarray(fechas)[serie, ventana, horizonte],
+        'Real': reales[serie, ventana, horizonte],
+        'Pronostico': np.asarray(pronosticos)[serie, ventana, horizonte],
+    })
+    largo['Error'] = largo['Pronostico'] - largo['Real']
+    if inferior is not None and superior is not None:
+        largo['Limite Inferior'] = np.asarray(inferior)[serie, ventana, horizonte]
+        largo['Limite Superior'] = np.asarray(superior)[serie, ventana, horizonte]
+    return largo
@@ -3,50 +3,70 @@ import pandas as pd
 import matplotlib.pyplot as plt
 import numpy as np
 from statsmodels.tsa.statespace.sarimax import SARIMAX
-from statsmodels.tsa.stattools import adfuller
 import warnings
 from sklearn.metrics import mean_absolute_error, mean_squared_error
-from utils import crear_carpeta
+from utils import crear_carpeta, fechas_pronostico
+import profiling
+from sarima_lotes import ajustar_sarima_lotes
+from escritor_salidas import EscritorAsincrono
+from demanda_intermitente import enrutar_series, pronosticar_intermitentes
 
 warnings.filterwarnings("ignore")
 
 def load_data(filepath):
     # Cargar los datos de la serie de tiempo
-    data = pd.read_csv(filepath, index_col=0, parse_dates=True, encoding='utf-8-sig')
+    with profiling.stage('load_data') as etapa:
+        data = pd.read_csv(filepath, index_col=0, parse_dates=True, encoding='utf-8-sig')
+        etapa.record(filas=len(data), archivo=filepath)
     return data
 
-def check_stationarity(series):
-    # Realizar la prueba de Dickey-Fuller para verificar la estacionaridad
-    result = adfuller(series.dropna())
-    return result[1] <= 0.05  # Retorna True si es estacionaria
-
-def difference_series(series):
-    # Diferenciar la serie si no es estacionaria
-    return series.diff().dropna()
-
 def fit_sarima_model(series, order=(1,1,1), seasonal_order=(1,1,1,52)):
     # Ajustar el modelo SARIMA
-    model = SARIMAX(series, order=order, seasonal_order=seasonal_order, enforce_stationarity=False, enforce_invertibility=False)
-    result = model.fit(disp=False)
+    with profiling.stage('fit_sarima', serie=series.name, filas=len(series)) as etapa:
+        model = SARIMAX(series, order=order, seasonal_order=seasonal_order, enforce_stationarity=False, enforce_invertibility=False)
+        result = model.fit(disp=False)
+        etapa.record(iteraciones=result.mle_retvals.get('iterations'), evaluaciones=result.mle_retvals.get('fcalls'))
     return result
 
+def fit_sarima_batch(data, order=(1,1,1), seasonal_order=(1,1,1,52)):
+    """
+    Ajusta el mismo modelo SARIMA para todas las columnas de `data` con un filtro de Kalman
+    vectorizado (ver sarima_lotes; equivale a SARIMAX con sarima_lotes.OPCIONES_SARIMAX).
+
+    Parámetros:
+    - data: DataFrame con una columna por serie (NaN donde no hay dato).
+    - order, seasonal_order: estructura compartida por todas las series.
+
+    Devuelve:
+    - dict columna -> resultado, compatible con generate_forecasts. Si alguna serie no tiene más
+      observaciones diferenciadas que parámetros, cada una se ajusta con fit_sarima_model.
+    """
+    try:
+        resultados = ajustar_sarima_lotes(data, order=order, seasonal_order=seasonal_order)
+    except ValueError as error:
+        # Menos observaciones que parámetros: ajustar cada serie con SARIMAX
+        print(f"Ajuste en lote no disponible ({error}). Se usa SARIMAX por serie.")
+        return {column: fit_sarima_model(data[column], order=order, seasonal_order=seasonal_order) for column in data.columns}
+    return {column: resultados[column] for column in resultados}
+
 def generate_forecasts(result, steps=48, repetitions=100):
     # Generar múltiples pronósticos para reflejar la variabilidad
     forecasts = []
 
-    for _ in range(repetitions):
-        forecast = result.get_forecast(steps=steps).predicted_mean.clip(lower=0)  # Evita valores negativos
-        forecasts.append(forecast)
+    with profiling.stage('generate_forecasts', filas=steps * repetitions):
+        for _ in range(repetitions):
+            forecast = result.get_forecast(steps=steps).predicted_mean.clip(lower=0)  # Evita valores negativos
+            forecasts.append(forecast)
 
-    forecasts_df = pd.DataFrame(forecasts).T
-    forecasts_df.index = pd.date_range(result.data.dates[-1] + pd.Timedelta(weeks=1), periods=steps, freq='W')
-    
-    # Pronóstico promedio de todas las simulaciones
-    forecast_series = forecasts_df.mean(axis=1)
+        forecasts_df = pd.DataFrame(forecasts).T
+        forecasts_df.index = fechas_pronostico(result.data.dates, steps)
+
+        # Pronóstico promedio de todas las simulaciones
+        forecast_series = forecasts_df.mean(axis=1)
     
     return forecast_series, forecasts_df
 
-def save_forecast_plots(series, forecast, ingredient_name, output_folder='ingredients_forecast'):
+def save_forecast_plots(series, forecast, ingredient_name, output_folder='ingredients_forecast', writer=None):
     """
     Guarda gráficos de pronóstico para un insumo específico.
 
@@ -55,27 +75,34 @@ def save_forecast_plots(series, forecast, ingredient_name, output_folder='ingred
     - forecast: serie de pronóstico.
     - ingredient_name: nombre del insumo.
     - output_folder: carpeta donde van los gráficos.
+    - writer: EscritorAsincrono opcional; si se indica, el archivo se escribe en segundo plano.
     """
     # Crear la carpeta de salida si no existe
     crear_carpeta(output_folder)
     
-    # Graficar la serie original y el pronóstico
-    plt.figure(figsize=(10, 6))
-    plt.plot(series, label='Datos Históricos', color='black', marker='o')
-    plt.plot(forecast, label='Pronóstico', color='green', linestyle='--', marker='o')
-
-    # Agregar títulos y etiquetas
-    plt.title(f'Pronóstico Semanal para {ingredient_name}', fontsize=14, fontweight='normal', loc='center')
-    plt.xlabel('Fecha')
-    plt.ylabel('Cantidad Usada')
-    plt.legend()
-    plt.grid(True)
-    
-    # Guardar el gráfico en la carpeta especificada
-    file_path = os.path.join(output_folder, f'{ingredient_name}_forecast.png')
-    plt.savefig(file_path)
-    plt.close()
-    print(f'Gráfico de pronóstico guardado en: {file_path}')
+    with profiling.stage('save_forecast_plots', serie=ingredient_name, filas=len(series) + len(forecast)):
+        # Graficar la serie original y el pronóstico
+        plt.figure(figsize=(10, 6))
+        plt.plot(series, label='Datos Históricos', color='black', marker='o')
+        plt.plot(forecast, label='Pronóstico', color='green', linestyle='--', marker='o')
+
+        # Agregar títulos y etiquetas
+        plt.title(f'Pronóstico Semanal para {ingredient_name}', fontsize=14, fontweight='normal', loc='center')
+        plt.xlabel('Fecha')
+        plt.ylabel('Cantidad Usada')
+        plt.legend()
+        plt.grid(True)
+
+        # Guardar el gráfico en la carpeta especificada
+        file_path = os.path.join(output_folder, f'{ingredient_name}_forecast.png')
+        if writer is not None:
+            writer.guardar_figura(plt.gcf(), file_path)
+        else:
+            plt.savefig(file_path)
+            plt.close()
+    # Con writer el archivo sólo queda en cola: se escribe al cerrar el escritor
+    estado = 'en cola para' if writer is not None else 'guardado en'
+    print(f'Gráfico de pronóstico {estado}: {file_path}')
 
 def save_forecasts_to_csv(forecasts, output_path='ingredient_forecasts.csv'):
     """
@@ -90,37 +117,60 @@ def save_forecasts_to_csv(forecasts, output_path='ingredient_forecasts.csv'):
     forecast_df.columns = forecasts.keys()
     
     # Guardar en CSV
-    forecast_df.to_csv(output_path, encoding='utf-8-sig')
+    with profiling.stage('save_forecasts_to_csv', filas=len(forecast_df)):
+        forecast_df.to_csv(output_path, encoding='utf-8-sig')
     print(f'Pronósticos guardados en: {output_path}')
 
-# Cargar el archivo de datos de ejemplo
-filepaths = ['weekly_ingredients.csv']  # Ajusta el nombre del archivo según corresponda
-forecast_results = {}  # Diccionario para almacenar los pronósticos de cada insumo
-
-for filepath in filepaths:
-    data = load_data(filepath)
-    for column in data.columns:
-        print(f"\nPronóstico para {column}")
-        series = data[column]
-        
-        # Verificar si la serie es estacionaria
-        if not check_stationarity(series):
-            print("La serie no es estacionaria, aplicando diferenciación.")
-            series = difference_series(series)
-        else:
-            print("La serie es estacionaria.")
-        
-        # Ajustar el modelo SARIMA
-        sarima_result = fit_sarima_model(series)
-        
-        # Generar pronósticos para las siguientes 48 semanas
-        forecast, simulations_df = generate_forecasts(sarima_result, steps=48, repetitions=100)
-        
-        # Guardar el gráfico de pronóstico
-        save_forecast_plots(data[column], forecast, column)
-        
-        # Guardar el pronóstico en el diccionario
-        forecast_results[column] = forecast
-
-# Guardar todos los pronósticos en un único archivo CSV
-save_forecasts_to_csv(forecast_results)
+def main():
+    """
+    Ajusta los modelos SARIMA de cada insumo, guarda los gráficos y el CSV de pronósticos.
+    """
+    # Cargar el archivo de datos de ejemplo
+    filepaths = ['weekly_ingredients.csv']  # Ajusta el nombre del archivo según corresponda
+    forecast_results = {}  # Diccionario para almacenar los pronósticos de cada insumo
+
+    # Ajustar todas las series juntas con el motor vectorizado (False: un SARIMAX por serie)
+    batched = True
+
+    # Escritura de gráficos en segundo plano (al salir del bloque se espera a que terminen,
+    # aunque un ajuste falle)
+    with EscritorAsincrono() as writer:
+        for filepath in filepaths:
+            all_data = load_data(filepath)
+
+            # Las series intermitentes van por el camino disperso (Croston/SBA) en lugar de SARIMA
+            data, sparse_series = enrutar_series(all_data)
+            if sparse_series:
+                print(f"\nSeries intermitentes (SBA): {', '.join(sparse_series)}")
+                intermittent_forecasts = pronosticar_intermitentes(sparse_series, steps=48)
+                for column in intermittent_forecasts.columns:
+                    save_forecast_plots(all_data[column], intermittent_forecasts[column], column, writer=writer)
+                    forecast_results[column] = intermittent_forecasts[column]
+
+            # Ajustar los modelos SARIMA sobre las series en niveles: el modelo (1,1,1)x(1,1,1,52) ya
+            # diferencia cada serie una vez (todas a la vez si batched)
+            sarima_results = fit_sarima_batch(data) if batched else {}
+
+            for column in data.columns:
+                print(f"\nPronóstico para {column}")
+
+                # Ajustar el modelo SARIMA
+                sarima_result = sarima_results[column] if batched else fit_sarima_model(data[column])
+
+                # Generar pronósticos para las siguientes 48 semanas
+                forecast, simulations_df = generate_forecasts(sarima_result, steps=48, repetitions=100)
+
+                # Guardar el gráfico de pronóstico
+                save_forecast_plots(data[column], forecast, column, writer=writer)
+
+                # Guardar el pronóstico en el diccionario
+                forecast_results[column] = forecast
+
+    # Guardar todos los pronósticos en un único archivo CSV
+    save_forecasts_to_csv(forecast_results)
+
+if __name__ == "__main__":
+    main()
+
+    # Exportar el perfilado de etapas (solo si IO_TPI_PROFILE está definida)
+    profiling.export()
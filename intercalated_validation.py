@@ -4,12 +4,17 @@ import numpy as np
 from statsmodels.tsa.statespace.sarimax import SARIMAX
 import warnings
 from utils import crear_carpeta
+from escritor_salidas import EscritorAsincrono
+import profiling
+from evaluacion_pronosticos import calcular_metricas, escala_mase, resumen_metricas, errores_formato_largo
 
 warnings.filterwarnings("ignore")
 
 def load_data(filepath):
     """Carga los datos desde un archivo CSV."""
-    data = pd.read_csv(filepath, index_col=0, parse_dates=True, encoding='utf-8-sig')
+    with profiling.stage('load_data') as etapa:
+        data = pd.read_csv(filepath, index_col=0, parse_dates=True, encoding='utf-8-sig')
+        etapa.record(filas=len(data), archivo=filepath)
     return data
 
 def format_week_interval(weeks):
@@ -17,16 +22,38 @@ def format_week_interval(weeks):
     return f"[{weeks[0].strftime('%Y-%m-%d')}, {weeks[-1].strftime('%Y-%m-%d')}]"
 
 def intercalated_validation(data, model_order=(1, 1, 1), seasonal_order=(1, 1, 1, 52), 
-                            train_weeks=4, test_weeks=2, output_folder='error_prediction'):
-    """Realiza validación intercalada con ventanas consecutivas de entrenamiento y prueba."""
+                            train_weeks=4, test_weeks=2, output_folder='error_prediction', writer=None,
+                            alpha=0.05):
+    """
+    Realiza validación intercalada con ventanas consecutivas de entrenamiento y prueba.
+
+    Los valores reales, los pronósticos y los intervalos de predicción (nivel 1 - alpha) de
+    todos los insumos se apilan en arrays (insumos, ventanas, semanas de prueba) y las métricas
+    se calculan juntas al final con evaluacion_pronosticos. Además del CSV de cada insumo se
+    escriben resumen_metricas.csv (una fila por insumo) y errores_semanales.csv (formato largo).
+
+    Si se indica `writer` (EscritorAsincrono), los CSV de cada insumo se escriben en segundo
+    plano mientras se ajustan los modelos del siguiente.
+
+    Devuelve:
+    - pd.DataFrame con el resumen de métricas por insumo.
+    """
     
     # Crear carpeta de salida si no existe
     crear_carpeta(output_folder)
+
+    # Arrays apilados (insumos, ventanas, semanas de prueba); NaN donde no hay ventana
+    window_weeks = train_weeks + test_weeks
+    n_windows = max((len(data[column].dropna()) // window_weeks for column in data.columns), default=0)
+    shape = (len(data.columns), n_windows, test_weeks)
+    actual, predicted, lower, upper = (np.full(shape, np.nan) for _ in range(4))
+    dates = np.full(shape, np.datetime64('NaT'), dtype='datetime64[ns]')
     
-    for column in data.columns:
+    for i, column in enumerate(data.columns):
         series = data[column].dropna()
-        results = []
+        intervals = []
         start_idx = 0
+        window = 0
         
         while start_idx + train_weeks + test_weeks <= len(series):
             # Definir semanas de entrenamiento y prueba consecutivas
@@ -34,8 +61,7 @@ def intercalated_validation(data, model_order=(1, 1, 1), seasonal_order=(1, 1, 1
             test_data = series.iloc[start_idx + train_weeks:start_idx + train_weeks + test_weeks]
             
             # Registrar el intervalo de semanas
-            train_interval = format_week_interval(train_data.index)
-            test_interval = format_week_interval(test_data.index)
+            intervals.append((format_week_interval(train_data.index), format_week_interval(test_data.index)))
             
             # Ajustar el modelo y realizar predicciones
             model = SARIMAX(
@@ -45,34 +71,63 @@ def intercalated_validation(data, model_order=(1, 1, 1), seasonal_order=(1, 1, 1
                 enforce_stationarity=False, 
                 enforce_invertibility=False
             )
-            result = model.fit(disp=False)
-            forecast = result.forecast(steps=test_weeks)
-            
-            # Calcular RMSE (Root Mean Squared Error)
-            squared_errors = (test_data - forecast) ** 2
-            rmse = np.sqrt(np.mean(squared_errors))
+            with profiling.stage('fit_sarima', serie=column, filas=len(train_data)) as etapa:
+                result = model.fit(disp=False)
+                etapa.record(iteraciones=result.mle_retvals.get('iterations'), evaluaciones=result.mle_retvals.get('fcalls'))
+            forecast = result.get_forecast(steps=test_weeks)
+            conf_int = np.asarray(forecast.conf_int(alpha=alpha))
             
-            # Guardar resultados
-            results.append({
-                'Train Weeks': train_interval,
-                'Test Weeks': test_interval,
-                'Avg Actual Value': test_data.mean(),
-                'Avg Predicted Value': forecast.mean(),
-                'Error (RMSE)': rmse
-            })
+            # Guardar valores reales, pronósticos e intervalos de la ventana
+            actual[i, window] = test_data.to_numpy()
+            predicted[i, window] = np.asarray(forecast.predicted_mean)
+            lower[i, window], upper[i, window] = conf_int[:, 0], conf_int[:, 1]
+            dates[i, window] = test_data.index.to_numpy()
             
             # Desplazar la ventana completamente (entrenamiento + prueba)
             start_idx += train_weeks + test_weeks
+            window += 1
+        
+        # Métricas por ventana del insumo (RMSE de cada ventana, como antes)
+        per_window = calcular_metricas(actual[i, :window], predicted[i, :window], ejes=1)
+        results_df = pd.DataFrame({
+            'Train Weeks': [train for train, _ in intervals],
+            'Test Weeks': [test for _, test in intervals],
+            'Avg Actual Value': actual[i, :window].mean(axis=1),
+            'Avg Predicted Value': predicted[i, :window].mean(axis=1),
+            'Error (RMSE)': per_window['RMSE'],
+        })
         
         # Guardar resultados en un archivo CSV
-        results_df = pd.DataFrame(results)
         output_path = os.path.join(output_folder, f'{column}_error_prediction.csv')
-        results_df.to_csv(output_path, index=False)
-        print(f"Archivo generado para {column}: {output_path}")
+        with profiling.stage('save_error_csv', serie=column, filas=len(results_df)):
+            if writer is not None:
+                writer.escribir_csv(results_df, output_path, index=False)
+            else:
+                results_df.to_csv(output_path, index=False)
+        print(f"Archivo {'en cola' if writer is not None else 'generado'} para {column}: {output_path}")
+
+    # Resumen de todos los insumos (MASE escalado con el pronóstico ingenuo sobre toda la serie)
+    names = list(data.columns)
+    scale = escala_mase(data.to_numpy(dtype=np.float64).T)
+    summary = resumen_metricas(names, actual, predicted, lower, upper, escala=scale)
+    weekly_errors = errores_formato_largo(names, dates, actual, predicted, lower, upper)
+    for frame, file_name, kwargs in ((summary, 'resumen_metricas.csv', {}), (weekly_errors, 'errores_semanales.csv', {'index': False})):
+        output_path = os.path.join(output_folder, file_name)
+        if writer is not None:
+            writer.escribir_csv(frame, output_path, **kwargs)
+        else:
+            frame.to_csv(output_path, **kwargs)
+        print(f"Archivo {'en cola' if writer is not None else 'generado'}: {output_path}")
+
+    return summary
 
 # Cargar los datos
 filepath = 'weekly_ingredients.csv'  # Cambia el nombre del archivo según corresponda
 data = load_data(filepath)
 
 # Ejecutar validación intercalada con ventanas de 4 semanas de entrenamiento y 2 de prueba
-intercalated_validation(data, train_weeks=4, test_weeks=2, output_folder='error_prediction')
+with EscritorAsincrono() as writer:
+    intercalated_validation(data, train_weeks=4, test_weeks=2, output_folder='error_prediction', writer=writer)
+
+# Exportar el perfilado de etapas (solo si IO_TPI_PROFILE está definida)
+profiling.export()
@@ -0,0 +1,198 @@
+import os
+from contextlib import nullcontext
+import numpy as np
+import pandas as pd
+from scipy.special import ndtri
+from concurrent.futures import ProcessPoolExecutor
+import profiling
+from muestreo import MuestreadorDemanda, potencia_de_dos
+from superficie_cte import calcular_cte
+from parametros_inventario import stock_proteccion_insumo
+
+
+class EstadisticasParciales:
+    """
+    Estadísticas combinables (cantidad, media, suma de cuadrados centrados, mínimo y máximo).
+
+    Permiten calcular media y desvío de muestras procesadas por separado y luego unirlas
+    (algoritmo de Chan et al.). Combinar siempre en el mismo orden da resultados idénticos
+    bit a bit. Los valores pueden ser vectores (por ejemplo, un CTE por cada q).
+    """
+    __slots__ = ('n', 'media', 'm2', 'minimo', 'maximo')
+
+    def __init__(self, n, media, m2, minimo, maximo):
+        self.n = n
+        self.media = media
+        self.m2 = m2
+        self.minimo = minimo
+        self.maximo = maximo
+
+    @classmethod
+    def desde_valores(cls, valores):
+        """Crea las estadísticas de un array (n,) o (n, m), agregando sobre el primer eje."""
+        valores = np.asarray(valores, dtype=np.float64)
+        media = valores.mean(axis=0)
+        return cls(len(valores), media, ((valores - media) ** 2).sum(axis=0), valores.min(axis=0), valores.max(axis=0))
+
+    def combinar(self, otra):
+        """Devuelve unas nuevas estadísticas que resumen ambas muestras."""
+        n = self.n + otra.n
+        delta = otra.media - self.media
+        media = self.media + delta * (otra.n / n)
+        m2 = self.m2 + otra.m2 + delta ** 2 * (self.n * otra.n / n)
+        return EstadisticasParciales(n, media, m2, np.minimum(self.minimo, otra.minimo), np.maximum(self.maximo, otra.maximo))
+
+    @property
+    def de(self):
+        """Desvío estándar muestral."""
+        return np.sqrt(self.m2 / (self.n - 1))
+
+
+def generar_unidades(temporadas, insumos, valores_q, muestras_por_temporada, tam_bloque, costo_orden):
+    """
+    Divide el trabajo en unidades (temporada, insumo, bloque de muestras).
+
+    El orden de las unidades solo depende de los parámetros, no de la cantidad de procesos,
+    y la unidad i siempre recibe el i-ésimo hijo de la SeedSequence raíz.
+
+    Devuelve:
+    - list de dict, una por unidad.
+    """
+    unidades = []
+    for temporada_info in temporadas:
+        for insumo, datos in temporada_info["demandas"].items():
+            q_todos = np.array([valores[insumo] for valores in valores_q.values()])
+            for inicio in range(0, muestras_por_temporada, tam_bloque):
+                unidades.append({
+                    "temporada": temporada_info["nombre"],
+                    "insumo": insumo,
+                    "inicio": inicio,
+                    "n": min(tam_bloque, muestras_por_temporada - inicio),
+                    "media": datos["media"],
+                    "de": datos["de"],
+                    "duracion": temporada_info["duracion_temporada"],
+                    "q": q_todos,
+                    "k": costo_orden,
+                    "c1": insumos[insumo]["c1"],
+                    "b": insumos[insumo]["b"],
+                    "Sp": stock_proteccion_insumo(temporada_info, insumo),
+                })
+    return unidades
+
+
+def _procesar_unidad(argumentos):
+    """Simula una unidad de trabajo. Se ejecuta en un proceso del pool."""
+    unidad, semilla, metodo, antiteticas, guardar_muestras = argumentos
+    rng = np.random.default_rng(semilla)
+    muestreador = MuestreadorDemanda(unidad["media"], unidad["de"], metodo=metodo, antiteticas=antiteticas, rng=rng)
+
+    demandas_totales = muestreador.muestrear(unidad["n"]) * unidad["duracion"]
+    ctes = calcular_cte(demandas_totales[:, None], k=unidad["k"], q=unidad["q"], c1=unidad["c1"], b=unidad["b"], Sp=unidad["Sp"])
+
+    estadisticas = EstadisticasParciales.desde_valores(ctes)
+    if not guardar_muestras:
+        return estadisticas, None, None
+    return estadisticas, demandas_totales, ctes
+
+
+def ejecutar_montecarlo(temporadas, insumos, valores_q, muestras_por_temporada, costo_orden, semilla=None,
+                        trabajadores=None, tam_bloque=10_000, metodo='mc', antiteticas=False, guardar_muestras=True,
+                        tolerancia_relativa=None, confianza=0.95, max_rondas=100):
+    """
+    Ejecuta la simulación de CTE repartiendo las unidades (temporada, insumo, bloque) en un pool de procesos.
+
+    Cada unidad usa un generador propio derivado con SeedSequence.spawn y las estadísticas parciales
+    se combinan en el orden de las unidades, por lo que el resultado es idéntico bit a bit para
+    cualquier cantidad de procesos.
+
+    Con `tolerancia_relativa` la simulación avanza por rondas: cada ronda agrega
+    `muestras_por_temporada` muestras a las combinaciones que todavía no convergieron y, tras
+    combinar las estadísticas, se descartan las que ya tienen un semiancho relativo del IC de la
+    media menor a la tolerancia para todos los q. El intervalo usa la varianza de las muestras
+    individuales, que es conservadora con 'lhs', 'sobol' y antitéticas.
+
+    Parámetros:
+    - temporadas, insumos, valores_q: ver parametros_inventario.
+    - muestras_por_temporada: int, muestras por combinación de temporada e insumo (por ronda).
+    - costo_orden: float, costo de orden ($).
+    - semilla: int, semilla raíz.
+    - trabajadores: int, cantidad de procesos (1 ejecuta en el proceso actual; None usa todos los núcleos).
+    - tam_bloque: int, muestras por unidad de trabajo.
+    - metodo: str, 'mc', 'lhs' o 'sobol' (cada bloque es un diseño independiente). Con 'sobol' el
+      bloque se redondea a una potencia de dos y las muestras por ronda a un múltiplo del bloque.
+    - antiteticas: bool, usar variables antitéticas.
+    - guardar_muestras: bool, si es False solo se devuelven las estadísticas agrupadas.
+    - tolerancia_relativa: float, semiancho del IC dividido por la media (None: una sola ronda).
+    - confianza: float, nivel de confianza del intervalo.
+    - max_rondas: int, tope de rondas.
+
+    Devuelve:
+    - tuple (pd.DataFrame de muestras con el formato de generar_resultados o None, pd.DataFrame agrupado).
+    """
+    if metodo == 'sobol':
+        # Cada bloque es una secuencia de Sobol: sólo conserva su equilibrio con 2^m puntos
+        tam_bloque = min(potencia_de_dos(tam_bloque), potencia_de_dos(muestras_por_temporada))
+        muestras_por_temporada = -(-muestras_por_temporada // tam_bloque) * tam_bloque
+    unidades_ronda = generar_unidades(temporadas, insumos, valores_q, muestras_por_temporada, tam_bloque, costo_orden)
+    raiz = np.random.SeedSequence(semilla)
+    z = ndtri(0.5 + confianza / 2)
+
+    trabajadores = trabajadores or os.cpu_count() or 1
+    estadisticas, muestras = {}, {}
+    pendientes = {(u["temporada"], u["insumo"]) for u in unidades_ronda}
+    with profiling.stage('montecarlo_paralelo', trabajadores=trabajadores) as etapa, \
+            (nullcontext() if trabajadores == 1 else ProcessPoolExecutor(max_workers=trabajadores)) as pool:
+        for ronda in range(1, max_rondas + 1):
+            unidades = [u for u in unidades_ronda if (u["temporada"], u["insumo"]) in pendientes]
+            semillas = raiz.spawn(len(unidades))
+            argumentos = [(u, s, metodo, antiteticas, guardar_muestras) for u, s in zip(unidades, semillas)]
+            if pool is None:
+                parciales = list(map(_procesar_unidad, argumentos))
+            else:
+                parciales = profiling.map_procesos(pool, _procesar_unidad, argumentos, chunksize=max(1, len(argumentos) // (4 * trabajadores)))
+
+            # Combinar en el orden de las unidades (determinista)
+            for unidad, (parcial, demandas, ctes) in zip(unidades, parciales):
+                clave = (unidad["temporada"], unidad["insumo"])
+                estadisticas[clave] = parcial if clave not in estadisticas else estadisticas[clave].combinar(parcial)
+                if guardar_muestras:
+                    muestras.setdefault(clave, []).append((demandas, ctes))
+
+            if tolerancia_relativa is None:
+                break
+            pendientes = {
+                clave for clave in pendientes
+                if np.max(z * estadisticas[clave].de / np.sqrt(estadisticas[clave].n) / np.abs(estadisticas[clave].media)) > tolerancia_relativa
+            }
+            if not pendientes:
+                break
+        etapa.record(filas=sum(p.n for p in estadisticas.values()), rondas=ronda)
+
+    # Estadísticas agrupadas sobre todos los q, como en cte_d_agrupados.csv
+    filas_agrupadas = []
+    for (temporada, insumo), parcial in estadisticas.items():
+        total = None
+        for j in range(len(valores_q)):
+            por_q = EstadisticasParciales(parcial.n, parcial.media[j], parcial.m2[j], parcial.minimo[j], parcial.maximo[j])
+            total = por_q if total is None else total.combinar(por_q)
+        filas_agrupadas.append({"Temporada": temporada, "Insumo": insumo, "Media_CTE": total.media, "DE_CTE": total.de})
+    agrupados = pd.DataFrame(filas_agrupadas).sort_values(["Temporada", "Insumo"]).reset_index(drop=True)
+
+    if not guardar_muestras:
+        return None, agrupados
+
+    bloques = []
+    q_ids = list(valores_q)
+    for (temporada, insumo), partes in muestras.items():
+        demandas = np.concatenate([d for d, _ in partes])
+        ctes = np.concatenate([c for _, c in partes])
+        n = len(demandas)
+        bloques.append(pd.DataFrame({
+            "Temporada": temporada,
+            "Insumo": insumo,
+            "q": np.repeat(q_ids, n),
+            "Muestra": np.tile(np.arange(1, n + 1), len(q_ids)),
+            "Demanda_Total": np.tile(demandas, len(q_ids)),
+            "CTE": ctes.T.ravel(),
+        }))
+    return pd.concat(bloques, ignore_index=True), agrupados
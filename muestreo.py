@@ -0,0 +1,151 @@
+import numpy as np
+from scipy.special import ndtr, ndtri
+from scipy.stats import qmc
+
+# Métodos de muestreo disponibles
+METODOS = ('mc', 'lhs', 'sobol')
+
+
+def potencia_de_dos(n):
+    """Devuelve la menor potencia de dos mayor o igual a n (al menos 2), el tamaño que conserva el equilibrio de 'sobol'."""
+    return 2 ** int(np.ceil(np.log2(max(n, 2))))
+
+
+def generadores(semilla, cantidad):
+    """
+    Crea generadores independientes y reproducibles a partir de una única semilla.
+
+    Cada generador proviene de un hijo de np.random.SeedSequence(semilla), por lo que
+    el generador i es siempre el mismo sin importar cuántos se pidan ni en qué orden se usen.
+
+    Parámetros:
+    - semilla: int o None, semilla raíz (None usa entropía del sistema).
+    - cantidad: int, cantidad de generadores.
+
+    Devuelve:
+    - list de np.random.Generator.
+    """
+    return [np.random.default_rng(hijo) for hijo in np.random.SeedSequence(semilla).spawn(cantidad)]
+
+
+class MuestreadorDemanda:
+    """
+    Genera muestras de una demanda normal N(media, de), opcionalmente truncada en 0.
+
+    Las muestras se obtienen transformando uniformes con la inversa de la normal, por lo
+    que todos los métodos ('mc', 'lhs', 'sobol') y las variables antitéticas comparten la
+    misma truncación: nunca se generan demandas negativas.
+
+    Parámetros:
+    - media: float, media de la demanda.
+    - de: float, desvío estándar de la demanda.
+    - metodo: str, 'mc' (Monte Carlo), 'lhs' (hipercubo latino) o 'sobol' (secuencia de Sobol aleatorizada).
+    - antiteticas: bool, si es True las muestras se generan de a pares (u, 1 - u).
+    - truncar: bool, si es True la distribución se trunca en 0.
+    - rng: np.random.Generator usado por el método elegido.
+    """
+
+    def __init__(self, media, de, metodo='mc', antiteticas=False, truncar=True, rng=None):
+        if metodo not in METODOS:
+            raise ValueError(f"Método de muestreo desconocido: {metodo}. Opciones: {METODOS}")
+        self.media = media
+        self.de = de
+        self.metodo = metodo
+        self.antiteticas = antiteticas
+        self.rng = rng if rng is not None else np.random.default_rng()
+
+        # Límite inferior en el espacio uniforme que corresponde a demanda 0
+        self._u_min = float(ndtr(-media / de)) if truncar and de > 0 else 0.0
+
+        if metodo == 'sobol':
+            self._motor = qmc.Sobol(d=1, scramble=True, seed=self.rng)
+        elif metodo == 'lhs':
+            self._motor = qmc.LatinHypercube(d=1, seed=self.rng)
+        else:
+            self._motor = None
+
+    def _uniformes(self, n):
+        if self._motor is None:
+            return self.rng.random(n)
+        return self._motor.random(n)[:, 0]
+
+    def muestrear(self, n):
+        """
+        Genera n muestras de demanda.
+
+        Parámetros:
+        - n: int, cantidad de muestras (con antitéticas, los pares quedan en posiciones consecutivas).
+
+        Devuelve:
+        - np.ndarray con las muestras.
+        """
+        if self.antiteticas:
+            u = self._uniformes((n + 1) // 2)
+            u = np.column_stack([u, 1 - u]).ravel()[:n]
+        else:
+            u = self._uniformes(n)
+
+        u = np.clip(self._u_min + u * (1 - self._u_min), 1e-12, 1 - 1e-12)
+        return self.media + self.de * ndtri(u)
+
+
+def muestrear_hasta_convergencia(muestreador, funcion, tolerancia_relativa=0.001, confianza=0.95,
+                                 tam_lote=256, max_muestras=1_000_000):
+    """
+    Genera muestras por lotes hasta que el intervalo de confianza de la media de `funcion`
+    tenga un semiancho relativo menor a la tolerancia.
+
+    Con variables antitéticas el intervalo se calcula sobre los promedios de cada par.
+    Para 'lhs' y 'sobol' el intervalo usa la varianza muestral, que es conservadora
+    (la varianza real del estimador es menor), así que el criterio nunca corta antes de tiempo.
+    Con 'sobol' la secuencia sólo conserva su equilibrio si el total de puntos generados es
+    una potencia de dos: el primer lote se redondea a la potencia de dos siguiente y cada
+    lote posterior duplica el total (sin superar max_muestras).
+
+    Parámetros:
+    - muestreador: MuestreadorDemanda.
+    - funcion: callable que recibe un array de muestras (n,) y devuelve (n,) o (n, m).
+    - tolerancia_relativa: float, semiancho del IC dividido por la media.
+    - confianza: float, nivel de confianza del intervalo.
+    - tam_lote: int, muestras por lote (par si se usan antitéticas; con 'sobol', el del primer lote).
+    - max_muestras: int, tope de muestras.
+
+    Devuelve:
+    - tuple (muestras, valores, semiancho_relativo).
+    """
+    if muestreador.antiteticas and tam_lote % 2:
+        raise ValueError("Con variables antitéticas el tamaño de lote debe ser par.")
+
+    sobol = muestreador.metodo == 'sobol'
+    if sobol:
+        tam_lote = potencia_de_dos(tam_lote)
+
+    z = ndtri(0.5 + confianza / 2)
+    muestras, valores = [], []
+    n = 0
+    semiancho_relativo = np.inf
+
+    while n < max_muestras:
+        if sobol:
+            lote = max(tam_lote, n)  # el total generado sigue siendo potencia de dos
+            if n and n + lote > max_muestras:
+                break
+        else:
+            lote = min(tam_lote, max_muestras - n)
+        x = muestreador.muestrear(lote)
+        muestras.append(x)
+        valores.append(np.asarray(funcion(x)))
+        n += len(x)
+        if len(muestras) < 2:
+            continue
+
+        y = np.concatenate(valores)
+        if muestreador.antiteticas:
+            y = y[: len(y) // 2 * 2]
+            y = 0.5 * (y[0::2] + y[1::2])
+        semiancho = z * y.std(axis=0, ddof=1) / np.sqrt(len(y))
+        semiancho_relativo = float(np.max(semiancho / np.abs(y.mean(axis=0))))
+        if semiancho_relativo <= tolerancia_relativa:
+            break
+
+    return np.concatenate(muestras), np.concatenate(valores), semiancho_relativo
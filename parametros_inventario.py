@@ -0,0 +1,98 @@
+# Parámetros compartidos por los análisis de sensibilidad y el cálculo del lote económico.
+
+# Costo de orden ($) utilizado en todos los análisis
+costo_orden = 30000
+
+# Información de temporadas con media y D.E. de demanda semanal (kg)
+temporadas = [
+    {
+        "nombre": "1",
+        "duracion_temporada": 14,
+        "demandas": {
+            "Harina de Trigo": {"media": 179.656, "de": 94.345},
+            "Azúcar": {"media": 3.245, "de": 1.608},
+            "Sal": {"media": 4.160, "de": 2.239},
+            "Manteca": {"media": 19.907, "de": 5.310},
+        },
+    },
+    {
+        "nombre": "2",
+        "duracion_temporada": 20,
+        "demandas": {
+            "Harina de Trigo": {"media": 319.834, "de": 117.840},
+            "Azúcar": {"media": 6.052, "de": 2.913},
+            "Sal": {"media": 7.405, "de": 2.694},
+            "Manteca": {"media": 22.662, "de": 10.443},
+        },
+    },
+    {
+        "nombre": "3",
+        "duracion_temporada": 7,
+        "demandas": {
+            "Harina de Trigo": {"media": 617.404, "de": 112.636},
+            "Azúcar": {"media": 12.547, "de": 3.240},
+            "Sal": {"media": 14.213, "de": 2.511},
+            "Manteca": {"media": 44.750, "de": 11.195},
+        },
+    },
+    {
+        "nombre": "4",
+        "duracion_temporada": 11,
+        "demandas": {
+            "Harina de Trigo": {"media": 284.965, "de": 90.564},
+            "Azúcar": {"media": 5.289, "de": 2.197},
+            "Sal": {"media": 6.558, "de": 2.096},
+            "Manteca": {"media": 22.052, "de": 6.242},
+        },
+    },
+]
+
+# Datos de los insumos
+insumos = {
+    "Harina de Trigo": {"b": 1600, "c1": 685.12, "Sp": 120, "volumen_unitario": 0.0018, "volumen_maximo": 22, "monto_maximo": 2000000},
+    "Azúcar": {"b": 1600, "c1": 685.12, "Sp": 4, "volumen_unitario": 0.0014, "volumen_maximo": 1.5, "monto_maximo": 90000},
+    "Sal": {"b": 1600, "c1": 685.12, "Sp": 3, "volumen_unitario": 0.00075, "volumen_maximo": 1, "monto_maximo": 110000},
+    "Manteca": {"b": 13000, "c1": 5566.6, "Sp": 12, "volumen_unitario": 0.0015, "volumen_maximo": 2.5, "monto_maximo": 800000},
+}
+
+# Tamaños de lote calculados previamente para cada temporada e insumo
+valores_q = {
+    1: {"Harina de Trigo": 469.3284, "Azúcar": 63.07593, "Sal": 71.41723, "Manteca": 54.80865},
+    2: {"Harina de Trigo": 748.4618, "Azúcar": 102.9572, "Sal": 113.8859, "Manteca": 69.89478},
+    3: {"Harina de Trigo": 615.2139, "Azúcar": 87.70286, "Sal": 93.34306, "Manteca": 58.10669},
+    4: {"Harina de Trigo": 523.9430, "Azúcar": 71.38043, "Sal": 79.48412, "Manteca": 51.13275},
+}
+
+
+def obtener_temporadas(desde_datos=False, filepath='weekly_ingredients.csv', n_temporadas=4, sp_desde_errores=False,
+                       errores_path='error_prediction/errores_semanales.csv', nivel_servicio=0.95, metodo_sp='empirico'):
+    """
+    Devuelve las temporadas a usar en los análisis.
+
+    Parámetros:
+    - desde_datos: bool, si es True las temporadas y sus estadísticas se detectan a partir de
+      las series semanales de insumos (ver deteccion_temporadas); si es False se usan las fijas.
+    - filepath: str, CSV con las series semanales de insumos.
+    - n_temporadas: int, cantidad de temporadas a detectar.
+    - sp_desde_errores: bool, si es True se agrega a cada insumo de cada temporada el stock de
+      protección ("Sp") calculado a partir de los errores de pronóstico (ver stock_proteccion).
+    - errores_path: str, CSV de errores semanales generado por intercalated_validation.
+    - nivel_servicio: float, nivel de servicio objetivo del stock de protección.
+    - metodo_sp: str, 'empirico', 'normal' o 'bootstrap'.
+
+    Devuelve:
+    - list de dict con nombre, duración y media/D.E. de demanda semanal (kg) por insumo.
+    """
+    resultado = temporadas
+    if desde_datos:
+        from deteccion_temporadas import detectar_temporadas
+        resultado = detectar_temporadas(filepath, n_temporadas=n_temporadas)
+    if sp_desde_errores:
+        from stock_proteccion import agregar_stock_proteccion
+        resultado = agregar_stock_proteccion(resultado, errores_path, nivel_servicio=nivel_servicio, metodo=metodo_sp)
+    return resultado
+
+
+def stock_proteccion_insumo(temporada_info, insumo):
+    """Stock de protección (kg) de un insumo en una temporada: el calculado si existe, si no el fijo."""
+    return temporada_info["demandas"][insumo].get("Sp", insumos[insumo]["Sp"])
@@ -0,0 +1,302 @@
+"""
+Perfilado liviano de etapas del pipeline: tiempo de reloj, tiempo de CPU y memoria pico.
+
+Límites de la medición de memoria: tracemalloc es global al proceso. Sólo las etapas del
+hilo principal miden memoria pico (las de otros hilos, como los escritores de
+EscritorAsincrono o el despachador de ServicioPronosticos, la registran como None), y el
+pico de una etapa del hilo principal incluye lo que otros hilos asignen mientras dura.
+
+Los procesos de un pool tienen sus propios registros: las tareas que se reparten con
+map_procesos se registran en el trabajador (una etapa por tarea, con su pid) y sus
+registros se devuelven al proceso principal. Con pool.map directo se pierden.
+"""
+import os
+import json
+import time
+import threading
+import tracemalloc
+from functools import wraps
+
+# El perfilado queda desactivado por defecto. Se activa con la variable de entorno
+# IO_TPI_PROFILE (ruta de salida: '.json' genera Chrome trace, cualquier otra extensión JSON lines)
+# o llamando a enable() desde código.
+_ruta_salida = os.environ.get('IO_TPI_PROFILE') or None
+_activo = _ruta_salida is not None
+_registros = []
+_pila = threading.local()
+_origen = time.perf_counter()
+_lock = threading.Lock()
+
+
+class _EtapaNula:
+    """Etapa vacía que se devuelve cuando el perfilado está desactivado (costo casi nulo)."""
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def record(self, **datos):
+        pass
+
+
+_ETAPA_NULA = _EtapaNula()
+
+
+class _Etapa:
+    """Mide tiempo de reloj, tiempo de CPU y memoria pico de un bloque de código."""
+    __slots__ = ('nombre', 'serie', 'datos', 'inicio', 'inicio_cpu', 'memoria_inicio', 'pico')
+
+    def __init__(self, nombre, serie, datos):
+        self.nombre = nombre
+        self.serie = serie
+        self.datos = datos
+        self.pico = 0
+
+    def __enter__(self):
+        pila = _obtener_pila()
+        if threading.current_thread() is not threading.main_thread():
+            # El pico de tracemalloc es global: reiniciarlo desde otro hilo arruinaría el del principal
+            self.memoria_inicio = None
+            pila.append(self)
+            self.inicio_cpu = time.process_time()
+            self.inicio = time.perf_counter()
+            return self
+        actual, pico = tracemalloc.get_traced_memory()
+        # El pico acumulado hasta ahora pertenece a la etapa contenedora
+        if pila:
+            pila[-1].pico = max(pila[-1].pico, pico)
+        tracemalloc.reset_peak()
+        pila.append(self)
+        self.memoria_inicio = actual
+        self.inicio_cpu = time.process_time()
+        self.inicio = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        fin = time.perf_counter()
+        fin_cpu = time.process_time()
+        pila = _obtener_pila()
+        pila.pop()
+        if self.memoria_inicio is None:
+            pico = delta = None
+        else:
+            self.pico = max(self.pico, tracemalloc.get_traced_memory()[1])
+            if pila:
+                pila[-1].pico = max(pila[-1].pico, self.pico)
+            pico, delta = self.pico, max(self.pico - self.memoria_inicio, 0)
+
+        registro = {
+            'etapa': self.nombre,
+            'serie': self.serie,
+            'inicio_s': self.inicio - _origen,
+            'duracion_s': fin - self.inicio,
+            'cpu_s': fin_cpu - self.inicio_cpu,
+            'memoria_pico_bytes': pico,
+            'memoria_pico_delta_bytes': delta,
+            'hilo': threading.get_ident(),
+            'pid': os.getpid(),
+        }
+        registro.update(self.datos)
+        with _lock:
+            _registros.append(registro)
+        return False
+
+    def record(self, **datos):
+        """Agrega datos a la etapa (por ejemplo filas=..., iteraciones=...)."""
+        self.datos.update(datos)
+
+
+def _obtener_pila():
+    if not hasattr(_pila, 'etapas'):
+        _pila.etapas = []
+    return _pila.etapas
+
+
+def enable(output_path=None):
+    """
+    Activa el perfilado e inicia el seguimiento de memoria.
+
+    Parámetros:
+    - output_path: str, ruta opcional donde export() escribirá los registros.
+    """
+    global _activo, _ruta_salida
+    _activo = True
+    if output_path is not None:
+        _ruta_salida = output_path
+    if not tracemalloc.is_tracing():
+        tracemalloc.start()
+
+
+def disable():
+    """Desactiva el perfilado y detiene el seguimiento de memoria."""
+    global _activo
+    _activo = False
+    if tracemalloc.is_tracing():
+        tracemalloc.stop()
+
+
+def is_enabled():
+    """Indica si el perfilado está activo."""
+    return _activo
+
+
+def stage(nombre, serie=None, **datos):
+    """
+    Devuelve un context manager que registra una etapa del pipeline.
+
+    Parámetros:
+    - nombre: str, nombre de la etapa (por ejemplo 'fit_sarima').
+    - serie: str, serie o insumo procesado, si corresponde.
+    - datos: valores adicionales a registrar (filas, iteraciones, etc.).
+
+    Uso:
+        with profiling.stage('fit_sarima', serie=column) as etapa:
+            result = model.fit(disp=False)
+            etapa.record(iteraciones=result.mle_retvals.get('iterations'))
+    """
+    if not _activo:
+        return _ETAPA_NULA
+    return _Etapa(nombre, serie, datos)
+
+
+def profiled(nombre=None):
+    """
+    Decorador que registra cada llamada a la función como una etapa.
+
+    Parámetros:
+    - nombre: str, nombre de la etapa (por defecto, el nombre de la función).
+    """
+    def decorador(func):
+        etiqueta = nombre or func.__name__
+
+        @wraps(func)
+        def envoltura(*args, **kwargs):
+            if not _activo:
+                return func(*args, **kwargs)
+            with _Etapa(etiqueta, None, {}):
+                return func(*args, **kwargs)
+        return envoltura
+    return decorador
+
+
+class _TareaPerfilada:
+    """Ejecuta una tarea en un proceso del pool como etapa y devuelve (resultado, registros)."""
+
+    def __init__(self, funcion, origen, ruta_salida):
+        self.funcion = funcion
+        self.origen = origen
+        self.ruta_salida = ruta_salida
+
+    def __call__(self, argumento):
+        global _origen
+        if not _activo:
+            # Con 'spawn' el trabajador no hereda enable()
+            enable(self.ruta_salida)
+        _origen = self.origen  # perf_counter es monótono para todo el sistema
+        with _lock:
+            inicio = len(_registros)
+        with _Etapa(self.funcion.__name__, None, {}):
+            resultado = self.funcion(argumento)
+        with _lock:
+            nuevos = _registros[inicio:]
+            del _registros[inicio:]
+        return resultado, nuevos
+
+
+def map_procesos(pool, funcion, argumentos, **opciones):
+    """
+    Equivale a list(pool.map(funcion, argumentos, **opciones)), pero con el perfilado activo
+    registra cada tarea (y las etapas que abra) en su trabajador y agrega esos registros a
+    los del proceso principal.
+
+    Parámetros:
+    - pool: concurrent.futures.ProcessPoolExecutor.
+    - funcion: callable de nivel de módulo (debe poder serializarse).
+    - argumentos: iterable con el argumento de cada tarea.
+    - opciones: argumentos de pool.map (por ejemplo chunksize).
+
+    Devuelve:
+    - list con los resultados, en el orden de los argumentos.
+    """
+    if not _activo:
+        return list(pool.map(funcion, argumentos, **opciones))
+    resultados = []
+    for resultado, registros in pool.map(_TareaPerfilada(funcion, _origen, _ruta_salida), argumentos, **opciones):
+        resultados.append(resultado)
+        with _lock:
+            _registros.extend(registros)
+    return resultados
+
+
+def records():
+    """Devuelve una copia de los registros acumulados."""
+    with _lock:
+        return list(_registros)
+
+
+def clear():
+    """Elimina los registros acumulados."""
+    with _lock:
+        _registros.clear()
+
+
+def export_jsonl(output_path):
+    """
+    Exporta los registros en formato JSON lines (un registro por línea).
+
+    Parámetros:
+    - output_path: str, ruta del archivo de salida.
+    """
+    with open(output_path, 'w', encoding='utf-8') as f:
+        for registro in records():
+            f.write(json.dumps(registro, ensure_ascii=False, default=str) + '\n')
+    print(f'Perfilado guardado en: {output_path}')
+
+
+def export_chrome_trace(output_path):
+    """
+    Exporta los registros en formato Chrome trace (abrir con chrome://tracing o Perfetto).
+
+    Parámetros:
+    - output_path: str, ruta del archivo de salida.
+    """
+    eventos = []
+    for registro in records():
+        args = {k: v for k, v in registro.items() if k not in ('etapa', 'inicio_s', 'duracion_s', 'hilo', 'pid')}
+        eventos.append({
+            'name': registro['etapa'] if registro['serie'] is None else f"{registro['etapa']} [{registro['serie']}]",
+            'cat': registro['etapa'],
+            'ph': 'X',
+            'ts': registro['inicio_s'] * 1e6,
+            'dur': registro['duracion_s'] * 1e6,
+            'pid': registro['pid'],
+            'tid': registro['hilo'],
+            'args': args,
+        })
+    with open(output_path, 'w', encoding='utf-8') as f:
+        json.dump({'traceEvents': eventos, 'displayTimeUnit': 'ms'}, f, ensure_ascii=False, default=str)
+    print(f'Perfilado guardado en: {output_path}')
+
+
+def export(output_path=None):
+    """
+    Exporta los registros si el perfilado está activo. El formato se elige por la extensión:
+    '.json' genera Chrome trace y cualquier otra, JSON lines.
+
+    Parámetros:
+    - output_path: str, ruta de salida (por defecto la de IO_TPI_PROFILE o enable()).
+    """
+    ruta = output_path or _ruta_salida
+    if not _activo or ruta is None:
+        return
+    if ruta.endswith('.json'):
+        export_chrome_trace(ruta)
+    else:
+        export_jsonl(ruta)
+
+
+if _activo:
+    tracemalloc.start()
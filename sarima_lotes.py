@@ -0,0 +1,530 @@
+import numpy as np
+import pandas as pd
+from types import SimpleNamespace
+from scipy.special import ndtri
+import profiling
+from utils import fechas_pronostico
+
+# Especificación de SARIMAX equivalente al ajuste en lote: las series se diferencian antes de
+# filtrar, el ARMA arranca en su distribución estacionaria (verosimilitud exacta, sin
+# observaciones descartadas) y sólo se restringen los polinomios AR. Con estas opciones SARIMAX
+# pronostica la serie diferenciada; ResultadosLote integra los pronósticos de vuelta a niveles.
+OPCIONES_SARIMAX = {'simple_differencing': True, 'enforce_stationarity': True, 'enforce_invertibility': False}
+
+# Cambio de P (relativo a F) por debajo del cual el filtro pasa al régimen estacionario
+TOLERANCIA_ESTABLE = 1e-13
+
+# Gradiente máximo (de -llf / nobs) con el que se da por convergida cada serie
+TOLERANCIA_GRADIENTE = 1e-4
+
+
+def _polinomio_lotes(coeficientes, paso, signo):
+    """
+    Arma el polinomio de rezagos 1 + signo * (c_1 L^paso + c_2 L^(2*paso) + ...) para cada serie.
+
+    Parámetros:
+    - coeficientes: np.ndarray (series, orden).
+    - paso: int, separación entre rezagos (1 o el período estacional).
+    - signo: int, -1 para polinomios AR y +1 para MA.
+
+    Devuelve:
+    - np.ndarray (series, orden * paso + 1).
+    """
+    n_series, orden = coeficientes.shape
+    if paso == 0 or orden == 0:
+        return np.ones((n_series, 1))  # sin componente (por ejemplo seasonal_order=(0, 0, 0, 0))
+    polinomio = np.zeros((n_series, orden * paso + 1))
+    polinomio[:, 0] = 1.0
+    polinomio[:, paso::paso] = signo * coeficientes
+    return polinomio
+
+
+def _multiplicar_polinomios(a, b):
+    """Producto de polinomios fila por fila: (series, n) x (series, m) -> (series, n + m - 1)."""
+    resultado = np.zeros((a.shape[0], a.shape[1] + b.shape[1] - 1))
+    for i in range(a.shape[1]):
+        resultado[:, i:i + b.shape[1]] += a[:, i:i + 1] * b
+    return resultado
+
+
+def _restringir_estacionario(sin_restringir):
+    """
+    Transformación de Monahan (la de statsmodels.tsa.statespace.tools.constrain_stationary_univariate)
+    aplicada fila por fila: lleva coeficientes libres a un polinomio AR estacionario.
+
+    Parámetros:
+    - sin_restringir: np.ndarray (series, orden).
+
+    Devuelve:
+    - np.ndarray (series, orden).
+    """
+    n = sin_restringir.shape[1]
+    if n == 0:
+        return sin_restringir
+    r = sin_restringir / np.sqrt(1 + sin_restringir ** 2)
+    y = np.zeros((len(sin_restringir), n, n))
+    for k in range(n):
+        for i in range(k):
+            y[:, k, i] = y[:, k - 1, i] + r[:, k] * y[:, k - 1, k - i - 1]
+        y[:, k, k] = r[:, k]
+    return -y[:, n - 1, :]
+
+
+def polinomio_diferenciacion(d, D, s):
+    """Coeficientes de (1 - L)^d (1 - L^s)^D."""
+    polinomio = np.array([1.0])
+    for _ in range(d):
+        polinomio = np.convolve(polinomio, [1.0, -1.0])
+    for _ in range(D):
+        estacional = np.zeros(s + 1)
+        estacional[0], estacional[s] = 1.0, -1.0
+        polinomio = np.convolve(polinomio, estacional)
+    return polinomio
+
+
+def diferenciar(y, polinomio):
+    """
+    Aplica el polinomio de diferenciación a todas las series a la vez.
+
+    Parámetros:
+    - y: np.ndarray (series, tiempo).
+    - polinomio: np.ndarray, coeficientes de polinomio_diferenciacion.
+
+    Devuelve:
+    - np.ndarray (series, tiempo - grado del polinomio).
+    """
+    grado = len(polinomio) - 1
+    n = y.shape[1] - grado
+    resultado = np.zeros((y.shape[0], n))
+    for j, c in enumerate(polinomio):
+        if c != 0:
+            resultado += c * y[:, grado - j:grado - j + n]
+    return resultado
+
+
+class EstructuraSARIMA:
+    """
+    Estructura (p,d,q)(P,D,Q,s) compartida por un lote de series.
+
+    Los parámetros de cada serie se ordenan como [ar (p), ma (q), ar estacional (P), ma estacional (Q)].
+    """
+
+    def __init__(self, order=(1, 1, 1), seasonal_order=(1, 1, 1, 52)):
+        self.p, self.d, self.q = order
+        self.P, self.D, self.Q, self.s = seasonal_order
+        self.k_params = self.p + self.q + self.P + self.Q
+        self.diferenciacion = polinomio_diferenciacion(self.d, self.D, self.s)
+        self.k_estados = max(self.p + self.s * self.P, self.q + self.s * self.Q + 1)
+
+    def nombres_parametros(self):
+        return ([f'ar.L{i}' for i in range(1, self.p + 1)] + [f'ma.L{i}' for i in range(1, self.q + 1)]
+                + [f'ar.S.L{self.s * i}' for i in range(1, self.P + 1)] + [f'ma.S.L{self.s * i}' for i in range(1, self.Q + 1)])
+
+    def polinomios(self, parametros):
+        """
+        Devuelve los coeficientes φ* (AR completo, con signo de la ecuación de transición)
+        y θ* (MA completo) de cada serie, ambos de largo k_estados.
+        """
+        p, q, P = self.p, self.q, self.P
+        ar = _multiplicar_polinomios(_polinomio_lotes(parametros[:, :p], 1, -1),
+                                     _polinomio_lotes(parametros[:, p + q:p + q + P], self.s, -1))
+        ma = _multiplicar_polinomios(_polinomio_lotes(parametros[:, p:p + q], 1, 1),
+                                     _polinomio_lotes(parametros[:, p + q + P:], self.s, 1))
+        phi = np.zeros((len(parametros), self.k_estados))
+        theta = np.zeros((len(parametros), self.k_estados))
+        phi[:, :ar.shape[1] - 1] = -ar[:, 1:]
+        theta[:, :ma.shape[1]] = ma
+        return phi, theta, ar, ma
+
+    def restringir(self, sin_restringir):
+        """Parámetros libres del optimizador -> parámetros del modelo (AR y AR estacional estacionarios)."""
+        p, q, P = self.p, self.q, self.P
+        parametros = sin_restringir.copy()
+        parametros[:, :p] = _restringir_estacionario(sin_restringir[:, :p])
+        parametros[:, p + q:p + q + P] = _restringir_estacionario(sin_restringir[:, p + q:p + q + P])
+        return parametros
+
+
+def _transicion(M, phi):
+    """
+    Calcula T @ M para matrices de transición compañeras (φ* en la primera columna y unos
+    sobre la diagonal superior) sin armar T: cuesta O(r^2) por serie en lugar de O(r^3).
+    """
+    if M.ndim == 2:
+        resultado = phi * M[:, :1]
+        resultado[:, :-1] += M[:, 1:]
+        return resultado
+    resultado = phi[:, :, None] * M[:, None, 0, :]
+    resultado[:, :-1, :] += M[:, 1:, :]
+    return resultado
+
+
+def covarianza_estacionaria(phi, theta, tolerancia=1e-12, max_iteraciones=64):
+    """
+    Covarianza incondicional del estado, P = T P T' + R R', para todas las series a la vez.
+
+    Usa el algoritmo de duplicación: P_{k+1} = P_k + A_k P_k A_k', A_{k+1} = A_k², que suma
+    2^k términos de la serie Σ T^j R R' T^j' por iteración. Requiere φ* estacionario (ver
+    EstructuraSARIMA.restringir).
+
+    Parámetros:
+    - phi, theta: np.ndarray (series, r), ver EstructuraSARIMA.polinomios.
+
+    Devuelve:
+    - np.ndarray (series, r, r).
+    """
+    n_series, r = phi.shape
+    A = np.zeros((n_series, r, r))
+    A[:, :, 0] = phi
+    A[:, np.arange(r - 1), np.arange(1, r)] = 1.0
+    P = theta[:, :, None] * theta[:, None, :]
+    for _ in range(max_iteraciones):
+        P = P + A @ P @ np.swapaxes(A, 1, 2)
+        A = A @ A
+        if np.abs(A).max() < tolerancia:
+            break
+    return P
+
+
+def filtro_kalman_lotes(y, phi, theta):
+    """
+    Filtro de Kalman vectorizado sobre un lote de series con la misma dimensión de estado.
+
+    Usa la representación de Harvey del ARMA de las series diferenciadas, con varianza
+    de innovación unitaria (la escala se concentra fuera de la verosimilitud). El estado
+    arranca en su distribución estacionaria, así que la verosimilitud es exacta y todas las
+    observaciones cuentan (la misma que SARIMAX con OPCIONES_SARIMAX). Los valores NaN se
+    tratan como datos faltantes. Cuando P deja de cambiar (TOLERANCIA_ESTABLE) el filtro
+    sigue sólo con el estado, hasta el próximo faltante.
+
+    Parámetros:
+    - y: np.ndarray (series, tiempo), series diferenciadas.
+    - phi, theta: np.ndarray (series, r), ver EstructuraSARIMA.polinomios.
+
+    Devuelve:
+    - SimpleNamespace con llf (series,), sigma2 (series,), nobs (series,) y el estado predicho final (a, P).
+    """
+    n_series, n = y.shape
+    a = np.zeros(phi.shape)
+    P = covarianza_estacionaria(phi, theta)
+    RR = theta[:, :, None] * theta[:, None, :]
+
+    suma_log_f = np.zeros(n_series)
+    suma_v2_f = np.zeros(n_series)
+    nobs = np.zeros(n_series)
+
+    estable = False
+    for t in range(n):
+        observado = ~np.isnan(y[:, t])
+        if estable and observado.all():
+            # Régimen estacionario: P, F y K ya no cambian, sólo se actualiza el estado
+            v = y[:, t] - a[:, 0]
+            a = _transicion(a + K * v[:, None], phi)
+            suma_log_f += log_f
+            suma_v2_f += v ** 2 / F
+            nobs += 1
+            continue
+
+        v = np.where(observado, y[:, t], 0.0) - a[:, 0]
+        F = P[:, 0, 0]
+        K = P[:, :, 0] / F[:, None]
+        log_f = np.log(F)
+
+        # Actualización (sólo para las series con dato en t)
+        if observado.all():
+            a = a + K * v[:, None]
+            P_filtrada = P - K[:, :, None] * P[:, None, 0, :]
+            suma_log_f += log_f
+            suma_v2_f += v ** 2 / F
+        else:
+            a = np.where(observado[:, None], a + K * v[:, None], a)
+            P_filtrada = np.where(observado[:, None, None], P - K[:, :, None] * P[:, None, 0, :], P)
+            suma_log_f += np.where(observado, log_f, 0.0)
+            suma_v2_f += np.where(observado, v ** 2 / F, 0.0)
+        nobs += observado
+
+        # Predicción
+        a = _transicion(a, phi)
+        P_siguiente = _transicion(np.swapaxes(_transicion(P_filtrada, phi), 1, 2), phi) + RR
+        estable = observado.all() and np.abs(P_siguiente - P).max() <= TOLERANCIA_ESTABLE * F.max()
+        P = P_siguiente
+
+    sigma2 = suma_v2_f / np.maximum(nobs, 1)
+    llf = -0.5 * nobs * (np.log(2 * np.pi * sigma2) + 1) - 0.5 * suma_log_f
+    return SimpleNamespace(llf=llf, sigma2=sigma2, nobs=nobs, a=a, P=P)
+
+
+class ResultadosLote:
+    """
+    Resultados del ajuste conjunto de un lote de series con la misma estructura SARIMA.
+
+    Se accede al resultado de cada serie con resultados[columna], que se comporta como un
+    resultado de SARIMAX para generate_forecasts (get_forecast, forecast, data.dates, mle_retvals).
+    mle_retvals es una lista con el diccionario de cada serie.
+    """
+
+    def __init__(self, estructura, columnas, fechas, niveles, parametros, filtro, mle_retvals):
+        self.estructura = estructura
+        self.columnas = list(columnas)
+        self.fechas = fechas
+        self.niveles = niveles
+        self.parametros = parametros
+        self.filtro = filtro
+        self.sigma2 = filtro.sigma2
+        self.llf = filtro.llf
+        self.mle_retvals = mle_retvals
+        self._cache = {}
+
+    def pronosticar(self, steps):
+        """
+        Pronostica `steps` períodos para todas las series.
+
+        La media se obtiene proyectando el estado filtrado e integrando la diferenciación.
+        La varianza suma la incertidumbre del estado predicho (P del filtro, que con series
+        cortas no es despreciable) y las innovaciones futuras, con los pesos ψ del modelo
+        integrado.
+
+        Devuelve:
+        - tuple (media, varianza), ambos np.ndarray (series, steps).
+        """
+        if steps in self._cache:
+            return self._cache[steps]
+
+        e = self.estructura
+        phi, theta, ar, ma = e.polinomios(self.parametros)
+
+        # Media de la serie diferenciada
+        a = self.filtro.a.copy()
+        media_dif = np.empty((len(a), steps))
+        for h in range(steps):
+            media_dif[:, h] = a[:, 0]
+            a = _transicion(a, phi)
+
+        # Integrar: y_t = y*_t - Σ_{j>=1} δ_j y_{t-j}
+        delta = e.diferenciacion
+        grado = len(delta) - 1
+        historia = np.concatenate([self.niveles[:, self.niveles.shape[1] - grado:], np.empty((len(a), steps))], axis=1)
+        for h in range(steps):
+            t = grado + h
+            historia[:, t] = media_dif[:, h] - sum(delta[j] * historia[:, t - j] for j in range(1, grado + 1))
+        media = historia[:, grado:]
+
+        # Pesos ψ del modelo integrado θ(L) / (φ(L) Δ(L))
+        ar_integrado = _multiplicar_polinomios(ar, np.broadcast_to(delta, (len(ar), len(delta))))
+        psi = np.zeros((len(a), steps))
+        psi[:, 0] = 1.0
+        for j in range(1, steps):
+            valor = ma[:, j] if j < ma.shape[1] else np.zeros(len(a))
+            for i in range(1, min(j, ar_integrado.shape[1] - 1) + 1):
+                valor = valor - ar_integrado[:, i] * psi[:, j - i]
+            psi[:, j] = valor
+
+        # Incertidumbre del estado predicho α_{T+1} (incluye la innovación de T+1): el error de
+        # la serie diferenciada en T+h es Z T^(h-1) (α - a), que se integra con los pesos de 1/Δ(L)
+        filas = np.empty((len(a), steps, phi.shape[1]))
+        fila = np.zeros(phi.shape)
+        fila[:, 0] = 1.0
+        for h in range(steps):
+            filas[:, h] = fila
+            fila = np.concatenate([(fila * phi).sum(axis=1, keepdims=True), fila[:, :-1]], axis=1)
+        pesos = np.zeros(steps)
+        pesos[0] = 1.0
+        for j in range(1, steps):
+            pesos[j] = -sum(delta[i] * pesos[j - i] for i in range(1, min(j, grado) + 1))
+        integracion = np.tril(pesos[np.subtract.outer(np.arange(steps), np.arange(steps)).clip(0)])
+        G = np.einsum('hi,nir->nhr', integracion, filas)
+        varianza_estado = np.einsum('nhr,nrs,nhs->nh', G, self.filtro.P, G)
+
+        # Las innovaciones de T+2 en adelante suman σ² Σ_{j<h-1} ψ_j²
+        varianza_futura = np.concatenate([np.zeros((len(a), 1)), np.cumsum(psi ** 2, axis=1)[:, :-1]], axis=1)
+        varianza = self.sigma2[:, None] * (varianza_estado + varianza_futura)
+
+        self._cache[steps] = (media, varianza)
+        return media, varianza
+
+    def __getitem__(self, columna):
+        return ResultadoSerie(self, self.columnas.index(columna))
+
+    def __iter__(self):
+        return iter(self.columnas)
+
+
+class PronosticoSerie:
+    """Pronóstico de una serie, con la misma interfaz básica que el de statsmodels."""
+
+    def __init__(self, media, error_estandar):
+        self.predicted_mean = media
+        self.se_mean = error_estandar
+
+    def conf_int(self, alpha=0.05):
+        z = ndtri(1 - alpha / 2)
+        return pd.DataFrame({
+            f'lower {self.predicted_mean.name}': self.predicted_mean - z * self.se_mean,
+            f'upper {self.predicted_mean.name}': self.predicted_mean + z * self.se_mean,
+        })
+
+
+class ResultadoSerie:
+    """Vista de una serie dentro de ResultadosLote."""
+
+    def __init__(self, lote, indice):
+        self.lote = lote
+        self.indice = indice
+        self.nombre = lote.columnas[indice]
+        self.data = SimpleNamespace(dates=lote.fechas)
+        self.params = pd.Series(np.append(lote.parametros[indice], lote.sigma2[indice]),
+                                index=lote.estructura.nombres_parametros() + ['sigma2'])
+        self.llf = lote.llf[indice]
+        self.mle_retvals = lote.mle_retvals[indice]
+
+    def get_forecast(self, steps=1):
+        media, varianza = self.lote.pronosticar(steps)
+        fechas = fechas_pronostico(self.lote.fechas, steps)
+        return PronosticoSerie(pd.Series(media[self.indice], index=fechas, name='predicted_mean'),
+                               pd.Series(np.sqrt(varianza[self.indice]), index=fechas, name='se_mean'))
+
+    def forecast(self, steps=1):
+        return self.get_forecast(steps).predicted_mean
+
+
+def _bfgs_lotes(funcion, x0, tolerancia, maxiter, armijo=1e-4, max_reducciones=30):
+    """
+    Minimiza por BFGS una función separable por filas: cada fila de x0 es un problema
+    independiente con su propia aproximación del hessiano y su propia búsqueda lineal, pero
+    todas las filas pendientes se evalúan juntas. Las filas que convergen dejan de evaluarse.
+
+    Parámetros:
+    - funcion: callable(x (m, k), filas (m,)) -> (valores (m,), gradientes (m, k)) de las filas indicadas.
+    - x0: np.ndarray (filas, k), punto inicial.
+    - tolerancia: float, gradiente máximo (en valor absoluto) para dar una fila por convergida.
+    - maxiter: int, iteraciones máximas por fila.
+    - armijo: float, constante de la condición de Armijo.
+    - max_reducciones: int, veces que se puede reducir a la mitad el paso antes de abandonar la fila.
+
+    Devuelve:
+    - tuple (x, iteraciones, evaluaciones, convergida), los tres últimos arrays (filas,).
+    """
+    x = x0.copy()
+    n, k = x.shape
+    valores, gradientes = funcion(x, np.arange(n))
+    H = np.broadcast_to(np.eye(k), (n, k, k)).copy()
+    iteraciones = np.zeros(n, dtype=np.int64)
+    evaluaciones = np.ones(n, dtype=np.int64)
+    convergida = np.abs(gradientes).max(axis=1) <= tolerancia
+    abandonada = np.zeros(n, dtype=bool)
+
+    for _ in range(maxiter):
+        activas = np.flatnonzero(~convergida & ~abandonada)
+        if len(activas) == 0:
+            break
+        g = gradientes[activas]
+        direccion = -np.einsum('nij,nj->ni', H[activas], g)
+        pendiente = (g * direccion).sum(axis=1)
+        # Si la dirección no desciende se reinicia el hessiano (paso de máximo descenso)
+        reiniciar = ~(pendiente < 0)
+        H[activas[reiniciar]] = np.eye(k)
+        direccion[reiniciar] = -g[reiniciar]
+        pendiente[reiniciar] = -(g[reiniciar] ** 2).sum(axis=1)
+
+        # Búsqueda lineal con retroceso, sólo sobre las filas que todavía no aceptaron el paso
+        alfa = np.ones(len(activas))
+        nuevos_valores = np.empty(len(activas))
+        nuevos_gradientes = np.empty((len(activas), k))
+        aceptada = np.zeros(len(activas), dtype=bool)
+        for _ in range(max_reducciones):
+            pendientes = np.flatnonzero(~aceptada)
+            if len(pendientes) == 0:
+                break
+            filas = activas[pendientes]
+            prueba = x[filas] + alfa[pendientes, None] * direccion[pendientes]
+            v, gr = funcion(prueba, filas)
+            evaluaciones[filas] += 1
+            ok = v <= valores[filas] + armijo * alfa[pendientes] * pendiente[pendientes]
+            nuevos_valores[pendientes[ok]], nuevos_gradientes[pendientes[ok]] = v[ok], gr[ok]
+            aceptada[pendientes[ok]] = True
+            alfa[pendientes[~ok]] /= 2
+        abandonada[activas[~aceptada]] = True
+
+        filas = activas[aceptada]
+        s = alfa[aceptada, None] * direccion[aceptada]
+        cambio = nuevos_gradientes[aceptada] - gradientes[filas]
+        x[filas] += s
+        valores[filas], gradientes[filas] = nuevos_valores[aceptada], nuevos_gradientes[aceptada]
+        iteraciones[filas] += 1
+        convergida[filas] = np.abs(gradientes[filas]).max(axis=1) <= tolerancia
+
+        # Actualización BFGS de la inversa del hessiano (si la curvatura es positiva); en la
+        # primera iteración se escala la identidad con s'y / y'y
+        sy = (s * cambio).sum(axis=1)
+        curvatura = sy > 1e-12
+        filas, s, cambio, sy = filas[curvatura], s[curvatura], cambio[curvatura], sy[curvatura]
+        primera = iteraciones[filas] == 1
+        H[filas[primera]] *= (sy[primera] / (cambio[primera] ** 2).sum(axis=1))[:, None, None]
+        rho = 1 / sy
+        Hy = np.einsum('nij,nj->ni', H[filas], cambio)
+        yHy = (cambio * Hy).sum(axis=1)
+        H[filas] += (((sy + yHy) * rho ** 2)[:, None, None] * s[:, :, None] * s[:, None, :]
+                     - rho[:, None, None] * (Hy[:, :, None] * s[:, None, :] + s[:, :, None] * Hy[:, None, :]))
+
+    return x, iteraciones, evaluaciones, convergida
+
+
+def ajustar_sarima_lotes(data, order=(1, 1, 1), seasonal_order=(1, 1, 1, 52), maxiter=200, paso=1e-6):
+    """
+    Ajusta por máxima verosimilitud un SARIMA con la misma estructura para todas las columnas.
+
+    Las series son independientes: cada una se optimiza con su propio BFGS (ver _bfgs_lotes),
+    pero todas las que siguen pendientes se evalúan en la misma pasada del filtro vectorizado.
+    El gradiente es por diferencias finitas: las k_params + 1 variantes de cada serie (sin
+    perturbar y una por parámetro) se apilan en el mismo lote, así cada evaluación cuesta una
+    sola pasada del filtro, sin importar la cantidad de series ni de parámetros.
+
+    El modelo es el de SARIMAX con OPCIONES_SARIMAX: con esos argumentos, SARIMAX da la misma
+    verosimilitud para los mismos parámetros. Como la verosimilitud es exacta desde la primera
+    observación diferenciada, alcanza con tener más observaciones que parámetros (el modelo
+    (1,1,1)x(1,1,1,52) se ajusta con las 39 semanas diferenciadas de weekly_ingredients.csv).
+
+    Parámetros:
+    - data: pd.DataFrame, una columna por serie, índice temporal compartido (NaN = faltante).
+    - order, seasonal_order: estructura SARIMA compartida.
+    - maxiter: int, iteraciones máximas de BFGS por serie.
+    - paso: float, paso de las diferencias finitas (en los parámetros libres).
+
+    Devuelve:
+    - ResultadosLote.
+
+    Lanza:
+    - ValueError si alguna serie no tiene más observaciones diferenciadas que parámetros
+      (conviene ajustar esas series con SARIMAX).
+    """
+    estructura = EstructuraSARIMA(order, seasonal_order)
+    niveles = data.to_numpy(dtype=np.float64).T
+    grado = len(estructura.diferenciacion) - 1
+    y = diferenciar(niveles, estructura.diferenciacion) if niveles.shape[1] > grado else np.empty((len(niveles), 0))
+    observadas = (~np.isnan(y)).sum(axis=1)
+    if observadas.min() <= estructura.k_params + 1:
+        raise ValueError(f"Las series tienen {int(observadas.min())} observaciones diferenciadas y el modelo "
+                         f"{order}x{seasonal_order} tiene {estructura.k_params + 1} parámetros: no se puede ajustar en lote.")
+
+    n_series, k = len(niveles), estructura.k_params
+
+    def menos_llf_y_gradiente(x, filas):
+        libres = np.repeat(x[None], k + 1, axis=0)
+        for j in range(k):
+            libres[j + 1, :, j] += paso
+        phi, theta, _, _ = estructura.polinomios(estructura.restringir(libres.reshape(-1, k)))
+        llf = filtro_kalman_lotes(np.tile(y[filas], (k + 1, 1)), phi, theta).llf
+        valores = np.where(np.isfinite(llf), -llf / np.tile(observadas[filas], k + 1), 1e10).reshape(k + 1, len(filas))
+        return valores[0], ((valores[1:] - valores[0]) / paso).T
+
+    with profiling.stage('fit_sarima_lotes', filas=y.size) as etapa:
+        libres, iteraciones, evaluaciones, convergida = _bfgs_lotes(
+            menos_llf_y_gradiente, np.zeros((n_series, k)), TOLERANCIA_GRADIENTE, maxiter)
+        parametros = estructura.restringir(libres)
+        phi, theta, _, _ = estructura.polinomios(parametros)
+        filtro = filtro_kalman_lotes(y, phi, theta)
+        mle_retvals = [{'iterations': int(i), 'fcalls': int(e), 'converged': bool(c)}
+                       for i, e, c in zip(iteraciones, evaluaciones, convergida)]
+        etapa.record(series=n_series, iteraciones=int(iteraciones.max()), evaluaciones=int(evaluaciones.sum()))
+
+    return ResultadosLote(estructura, data.columns, data.index, niveles, parametros, filtro, mle_retvals)
@@ -2,124 +2,82 @@ import numpy as np
 import pandas as pd
 import os
 import matplotlib.pyplot as plt
+import profiling
+from parametros_inventario import obtener_temporadas, stock_proteccion_insumo, insumos, valores_q, costo_orden
+from superficie_cte import calcular_cte
+from muestreo import generadores, MuestreadorDemanda, muestrear_hasta_convergencia, potencia_de_dos
+from montecarlo_paralelo import ejecutar_montecarlo
+from escritor_salidas import EscritorAsincrono
 
 # Configuración de carpeta y subcarpeta de salida
 output_dir_base = 'sensitivity'
 output_dir = os.path.join(output_dir_base, 'd')
 os.makedirs(output_dir, exist_ok=True)
 
-# Información de temporadas con media y D.E. de demanda
-temporadas = [
-    {
-        "nombre": "1",
-        "duracion_temporada": 14,
-        "demandas": {
-            "Harina de Trigo": {"media": 179.656, "de": 94.345},
-            "Azúcar": {"media": 3.245, "de": 1.608},
-            "Sal": {"media": 4.160, "de": 2.239},
-            "Manteca": {"media": 19.907, "de": 5.310},
-        },
-    },
-    {
-        "nombre": "2",
-        "duracion_temporada": 20,
-        "demandas": {
-            "Harina de Trigo": {"media": 319.834, "de": 117.840},
-            "Azúcar": {"media": 6.052, "de": 2.913},
-            "Sal": {"media": 7.405, "de": 2.694},
-            "Manteca": {"media": 22.662, "de": 10.443},
-        },
-    },
-    {
-        "nombre": "3",
-        "duracion_temporada": 7,
-        "demandas": {
-            "Harina de Trigo": {"media": 617.404, "de": 112.636},
-            "Azúcar": {"media": 12.547, "de": 3.240},
-            "Sal": {"media": 14.213, "de": 2.511},
-            "Manteca": {"media": 44.750, "de": 11.195},
-        },
-    },
-    {
-        "nombre": "4",
-        "duracion_temporada": 11,
-        "demandas": {
-            "Harina de Trigo": {"media": 284.965, "de": 90.564},
-            "Azúcar": {"media": 5.289, "de": 2.197},
-            "Sal": {"media": 6.558, "de": 2.096},
-            "Manteca": {"media": 22.052, "de": 6.242},
-        },
-    },
-]
-
-# Datos de los insumos
-insumos = {
-    "Harina de Trigo": {"b": 1600, "c1": 685.12, "Sp": 120, "volumen_unitario": 0.0018, "volumen_maximo": 22, "monto_maximo": 2000000},
-    "Azúcar": {"b": 1600, "c1": 685.12, "Sp": 4, "volumen_unitario": 0.0014, "volumen_maximo": 1.5, "monto_maximo": 90000},
-    "Sal": {"b": 1600, "c1": 685.12, "Sp": 3, "volumen_unitario": 0.00075, "volumen_maximo": 1, "monto_maximo": 110000},
-    "Manteca": {"b": 13000, "c1": 5566.6, "Sp": 12, "volumen_unitario": 0.0015, "volumen_maximo": 2.5, "monto_maximo": 800000},
-}
+def generar_resultados(temporadas, insumos, valores_q, muestras_por_temporada, semilla=None, metodo='mc',
+                       antiteticas=False, tolerancia_relativa=None):
+    """
+    Genera las simulaciones de CTE para cada combinación de temporada e insumo.
 
-# Tamaños de lote calculados previamente para cada temporada e insumo
-valores_q = {
-    1: {"Harina de Trigo": 469.3284, "Azúcar": 63.07593, "Sal": 71.41723, "Manteca": 54.80865},
-    2: {"Harina de Trigo": 748.4618, "Azúcar": 102.9572, "Sal": 113.8859, "Manteca": 69.89478},
-    3: {"Harina de Trigo": 615.2139, "Azúcar": 87.70286, "Sal": 93.34306, "Manteca": 58.10669},
-    4: {"Harina de Trigo": 523.9430, "Azúcar": 71.38043, "Sal": 79.48412, "Manteca": 51.13275},
-}
+    Args:
+        temporadas (list): Temporadas con duración y media/D.E. de demanda por insumo.
+        insumos (dict): Costos y stock de protección por insumo.
+        valores_q (dict): Tamaños de lote por temporada e insumo.
+        muestras_por_temporada (int): Muestras por combinación (tamaño de lote si hay tolerancia).
+            Con 'sobol' se redondea a la potencia de dos siguiente.
+        semilla (int): Semilla raíz; cada combinación usa un generador propio derivado de ella.
+        metodo (str): 'mc', 'lhs' o 'sobol'.
+        antiteticas (bool): Usar variables antitéticas.
+        tolerancia_relativa (float): Si se indica, se muestrea hasta que el IC 95% de la media
+            del CTE (para todos los q) tenga ese semiancho relativo.
 
-def calcular_cte(d, k, q, c1, b, Sp):
-    """
-    Calcula el Costo Total Esperado (CTE).
-    
-    Args (todos float):
-        d: Demanda total de la temporada (kg).
-        k: Costo de Orden ($).
-        q: Tamaño del Lote (kg).
-        c1: Costo unitario de Mantenimiento ($/kg).
-        b: Costo unitario de Adquisición ($).
-        Sp: Stock de Protección (kg).
-        
     Returns:
-        float: Costo total esperado.
-    """
-    return (d * k / q) + (q * c1 / 2) + (d * b) + (Sp * c1)
-
-def generar_resultados(temporadas, insumos, valores_q, muestras_por_temporada):
-    """
-    Genera las simulaciones de CTE para cada combinación de temporada e insumo.
+        pd.DataFrame: Una fila por muestra y tamaño de lote.
     """
     resultados = {"Temporada": [], "Insumo": [], "q": [], "Muestra": [], "Demanda_Total": [], "CTE": []}
+    combinaciones = [(t, insumo) for t in temporadas for insumo in t["demandas"]]
+    rngs = generadores(semilla, len(combinaciones))
     
-    for temporada_info in temporadas:
+    for (temporada_info, insumo), rng in zip(combinaciones, rngs):
         temporada = temporada_info["nombre"]
         duracion_temporada = temporada_info["duracion_temporada"]
+        datos = temporada_info["demandas"][insumo]
+        muestreador = MuestreadorDemanda(datos["media"], datos["de"], metodo=metodo, antiteticas=antiteticas, rng=rng)
+        
+        if tolerancia_relativa is None:
+            # Sobol sólo conserva su equilibrio con 2^m puntos
+            n = potencia_de_dos(muestras_por_temporada) if metodo == 'sobol' else muestras_por_temporada
+            muestras = muestreador.muestrear(n)
+        else:
+            # Detener el muestreo cuando la media del CTE es suficientemente precisa para todos los q
+            q_todos = np.array([valores[insumo] for valores in valores_q.values()])
+            def funcion(x):
+                return calcular_cte(x[:, None] * duracion_temporada, k=costo_orden, q=q_todos, c1=insumos[insumo]["c1"],
+                                    b=insumos[insumo]["b"], Sp=stock_proteccion_insumo(temporada_info, insumo))
+
+            muestras, _, _ = muestrear_hasta_convergencia(muestreador, funcion, tolerancia_relativa, tam_lote=muestras_por_temporada)
         
-        for insumo, datos in temporada_info["demandas"].items():
-            demanda_media = datos["media"]
-            desviacion = datos["de"]
-            muestras = np.random.normal(loc=demanda_media, scale=desviacion, size=muestras_por_temporada)
+        demandas_totales = muestras * duracion_temporada
+        
+        for q_id, valores in valores_q.items():
+            q = valores[insumo]
+            
+            # Calcular el CTE de todas las muestras a la vez
+            ctes = calcular_cte(demandas_totales, k=costo_orden, q=q, c1=insumos[insumo]["c1"], b=insumos[insumo]["b"], Sp=stock_proteccion_insumo(temporada_info, insumo))
             
-            for q_id, valores in valores_q.items():
-                q = valores[insumo]
-                for i, muestra in enumerate(muestras):
-                    
-                    # Conseguir parámetros y calcular CTE
-                    demanda_total = muestra * duracion_temporada
-                    cte = calcular_cte(demanda_total, k=30000, q=q, c1=insumos[insumo]["c1"], b=insumos[insumo]["b"], Sp=insumos[insumo]["Sp"])
-                    
-                    # Guardar resultados
-                    resultados["Temporada"].append(temporada)
-                    resultados["Insumo"].append(insumo)
-                    resultados["q"].append(q_id)
-                    resultados["Muestra"].append(i + 1)
-                    resultados["Demanda_Total"].append(demanda_total)
-                    resultados["CTE"].append(cte)
+            # Guardar resultados
+            resultados["Temporada"].extend([temporada] * len(muestras))
+            resultados["Insumo"].extend([insumo] * len(muestras))
+            resultados["q"].extend([q_id] * len(muestras))
+            resultados["Muestra"].extend(range(1, len(muestras) + 1))
+            resultados["Demanda_Total"].extend(demandas_totales)
+            resultados["CTE"].extend(ctes)
     return pd.DataFrame(resultados)
 
-def guardar_histogramas(df_resultados, output_dir):
+def guardar_histogramas(df_resultados, output_dir, escritor=None):
     """
     Genera y guarda histogramas del CTE para cada combinación de temporada e insumo.
+    Si se indica `escritor` (EscritorAsincrono), los archivos se escriben en segundo plano.
     """
     for temporada in df_resultados["Temporada"].unique():
         for insumo in df_resultados["Insumo"].unique():
@@ -134,24 +92,71 @@ def guardar_histogramas(df_resultados, output_dir):
             
             filename = f"{insumo}_{temporada}_sensitivity_d.png".replace(" ", "_")
             filepath = os.path.join(output_dir, filename)
-            plt.savefig(filepath, dpi=300, bbox_inches='tight')
-            plt.close()
+            if escritor is not None:
+                escritor.guardar_figura(plt.gcf(), filepath, dpi=300, bbox_inches='tight')
+            else:
+                plt.savefig(filepath, dpi=300, bbox_inches='tight')
+                plt.close()
 
 # Configuración: muestras a generar por temporada para cada insumo
 muestras_por_temporada = 50  
 
-# Generar y guardar resultados
-df_resultados = generar_resultados(temporadas, insumos, valores_q,muestras_por_temporada)
-df_resultados.to_csv(f"{output_dir}/muestras_cte_d.csv", index=False)
-print("Las muestras se han guardado en 'muestras_cte_d.csv'.")
-   
-# Calcular y guardar estadísticas agrupadas 
-agrupados = df_resultados.groupby(["Temporada", "Insumo"]).agg(
-    Media_CTE=("CTE", "mean"),
-    DE_CTE=("CTE", "std")
-).reset_index()
-agrupados.to_csv(f"{output_dir}/cte_d_agrupados.csv", index=False)
-print("Los resultados agrupados se han guardado en 'cte_d_agrupados.csv'.")
+# Configuración del muestreo: semilla para resultados reproducibles, método ('mc', 'lhs' o 'sobol'),
+# variables antitéticas y tolerancia relativa opcional para el muestreo adaptativo (por ejemplo 0.001)
+semilla = 2024
+metodo_muestreo = 'lhs'
+antiteticas = False
+tolerancia_relativa = None
+
+# Modo de ejecución: 'serie' (un proceso) o 'paralelo' (pool de procesos por temporada, insumo y bloque).
+# En modo paralelo el resultado es el mismo para cualquier cantidad de trabajadores.
+modo_ejecucion = 'serie'
+trabajadores = None  # None usa todos los núcleos
+tam_bloque = 10_000
+
+# Si es True, las temporadas y sus demandas se detectan a partir de weekly_ingredients.csv
+temporadas_desde_datos = False
+# El stock de protección sale de los errores de pronóstico cuando existe error_prediction/errores_semanales.csv
+# (generado por intercalated_validation); si no, se usan los valores fijos
+sp_desde_errores = os.path.exists(os.path.join('error_prediction', 'errores_semanales.csv'))
+
+def main():
+    """
+    Función principal para realizar el análisis de sensibilidad en la demanda.
+    """
+    temporadas = obtener_temporadas(temporadas_desde_datos, sp_desde_errores=sp_desde_errores)
+    
+    # Generar y guardar resultados
+    with profiling.stage('generar_resultados') as etapa:
+        if modo_ejecucion == 'paralelo':
+            df_resultados, agrupados = ejecutar_montecarlo(temporadas, insumos, valores_q, muestras_por_temporada, costo_orden,
+                                                           semilla=semilla, trabajadores=trabajadores, tam_bloque=tam_bloque,
+                                                           metodo=metodo_muestreo, antiteticas=antiteticas,
+                                                           tolerancia_relativa=tolerancia_relativa)
+        else:
+            df_resultados = generar_resultados(temporadas, insumos, valores_q, muestras_por_temporada, semilla=semilla,
+                                               metodo=metodo_muestreo, antiteticas=antiteticas, tolerancia_relativa=tolerancia_relativa)
+            
+            # Calcular estadísticas agrupadas 
+            agrupados = df_resultados.groupby(["Temporada", "Insumo"]).agg(
+                Media_CTE=("CTE", "mean"),
+                DE_CTE=("CTE", "std")
+            ).reset_index()
+        etapa.record(filas=len(df_resultados))
+    df_resultados.to_csv(f"{output_dir}/muestras_cte_d.csv", index=False)
+    print("Las muestras se han guardado en 'muestras_cte_d.csv'.")
+    
+    # Guardar estadísticas agrupadas
+    agrupados.to_csv(f"{output_dir}/cte_d_agrupados.csv", index=False)
+    print("Los resultados agrupados se han guardado en 'cte_d_agrupados.csv'.")
+    
+    # Generar histogramas en .PNG
+    with profiling.stage('guardar_histogramas', filas=len(df_resultados)):
+        with EscritorAsincrono() as escritor:
+            guardar_histogramas(df_resultados, output_dir, escritor=escritor)
+
+if __name__ == "__main__":
+    main()
     
-# Generar histogramas en .PNG
-guardar_histogramas(df_resultados, output_dir)
\ No newline at end of file
+    # Exportar el perfilado de etapas (solo si IO_TPI_PROFILE está definida)
+    profiling.export()
@@ -2,14 +2,18 @@ import pandas as pd
 import matplotlib.pyplot as plt
 from utils import crear_carpeta
 import os
+import profiling
+from escritor_salidas import EscritorAsincrono
+from cubo_series import CuboSeries
 
-def plot_weekly_ingredient_series(ingredient_series_data, output_folder):
+def plot_weekly_ingredient_series(ingredient_series_data, output_folder, writer=None):
     """
     Genera gráficos de series de tiempo semanales para cada insumo y los guarda en una carpeta.
 
     Parámetros:
     - ingredient_series_data: str, archivo CSV con los datos semanales de insumos.
     - output_folder: str, carpeta donde se guardarán los gráficos generados.
+    - writer: EscritorAsincrono opcional; si se indica, los archivos se escriben en segundo plano.
     """
     # Cargar datos semanales de insumos desde un archivo CSV
     weekly_ingredients = pd.read_csv(ingredient_series_data, index_col=0, parse_dates=True, encoding='utf-8-sig')
@@ -19,20 +23,41 @@ def plot_weekly_ingredient_series(ingredient_series_data, output_folder):
 
     # Generar gráficos para cada columna (insumo) en el archivo
     for ingredient in weekly_ingredients.columns:
-        plt.figure(figsize=(10, 6))
-        plt.plot(weekly_ingredients.index, weekly_ingredients[ingredient], marker='o', linestyle='-')
-        plt.title(f'Serie de Tiempo Semanal para {ingredient}')
-        plt.xlabel('Semana')
-        plt.ylabel('Cantidad Usada')
-        plt.grid(True)
-
-        # Guardar el gráfico en un archivo dentro de la carpeta de salida
-        file_path = os.path.join(output_folder, f'{ingredient}_weekly_series.png')
-        plt.savefig(file_path)
-        plt.close()  # Cerrar el gráfico para liberar memoria
-        print(f'Gráfico guardado en: {file_path}')
+        with profiling.stage('plot_weekly_series', serie=ingredient, filas=len(weekly_ingredients)):
+            plt.figure(figsize=(10, 6))
+            plt.plot(weekly_ingredients.index, weekly_ingredients[ingredient], marker='o', linestyle='-')
+            plt.title(f'Serie de Tiempo Semanal para {ingredient}')
+            plt.xlabel('Semana')
+            plt.ylabel('Cantidad Usada')
+            plt.grid(True)
+
+            # Guardar el gráfico en un archivo dentro de la carpeta de salida
+            file_path = os.path.join(output_folder, f'{ingredient}_weekly_series.png')
+            if writer is not None:
+                writer.guardar_figura(plt.gcf(), file_path)
+            else:
+                plt.savefig(file_path)
+                plt.close()  # Cerrar el gráfico para liberar memoria
+        # Con writer el archivo sólo queda en cola: se escribe al cerrar el escritor
+        print(f"Gráfico {'en cola para' if writer is not None else 'guardado en'}: {file_path}")
+
+    if writer is None:
+        print(f"Gráficos generados y guardados en la carpeta '{output_folder}'.")
+
+def weekly_ingredient_series_from_cube(cube_dir, selected_ingredients, ingredient_series_data):
+    """
+    Obtiene las series semanales de insumos desde el cubo de series (ver cubo_series) y las guarda en un CSV.
 
-    print(f"Gráficos generados y guardados en la carpeta '{output_folder}'.")
+    Parámetros:
+    - cube_dir: str, carpeta del cubo generado por series_productos.py.
+    - selected_ingredients: Lista de insumos a incluir en las series de tiempo.
+    - ingredient_series_data: Ruta donde se guardará el archivo con las series de tiempo semanales.
+    """
+    cube = CuboSeries.cargar(cube_dir)
+    weekly_ingredients = cube.serie_insumos(freq='W', insumos=selected_ingredients, etiqueta='inicio')
+    weekly_ingredients.index.name = None
+    weekly_ingredients.to_csv(ingredient_series_data)
+    print(f"Series de tiempo semanales obtenidas del cubo y guardadas en {ingredient_series_data}")
 
 def generate_weekly_ingredient_series(sales_data_path, ingredient_data_path, selected_ingredients, ingredient_series_data):
     """
@@ -45,8 +70,10 @@ def generate_weekly_ingredient_series(sales_data_path, ingredient_data_path, sel
     - ingredient_series_data: Ruta donde se guardará el archivo con las series de tiempo semanales.
     """
     # Cargar los datos de ventas y de ingredientes
-    sales_data = pd.read_csv(sales_data_path, parse_dates=['date'], encoding='utf-8-sig')
-    ingredient_data = pd.read_csv(ingredient_data_path, index_col=0, encoding='utf-8-sig')
+    with profiling.stage('load_sales_and_ingredients') as etapa:
+        sales_data = pd.read_csv(sales_data_path, parse_dates=['date'], encoding='utf-8-sig')
+        ingredient_data = pd.read_csv(ingredient_data_path, index_col=0, encoding='utf-8-sig')
+        etapa.record(filas=len(sales_data))
 
     # Filtrar solo las columnas de los ingredientes seleccionados
     ingredient_data = ingredient_data[selected_ingredients]
@@ -58,12 +85,13 @@ def generate_weekly_ingredient_series(sales_data_path, ingredient_data_path, sel
     weekly_ingredients = pd.DataFrame(index=sales_data['week'].unique(), columns=selected_ingredients).fillna(0)
 
     # Agrupar las ventas por producto y semana para calcular los insumos usados
-    for product, group in sales_data.groupby('article'):
-        if product in ingredient_data.index:  # Verificar si el producto tiene ingredientes registrados
-            product_ingredients = ingredient_data.loc[product]
-            for week, week_data in group.groupby('week'):
-                total_quantity = week_data['Quantity'].sum()  # Sumar la cantidad total vendida en la semana
-                weekly_ingredients.loc[week] += total_quantity * product_ingredients  # Multiplicar por los insumos
+    with profiling.stage('aggregate_weekly_ingredients', filas=len(sales_data)):
+        for product, group in sales_data.groupby('article'):
+            if product in ingredient_data.index:  # Verificar si el producto tiene ingredientes registrados
+                product_ingredients = ingredient_data.loc[product]
+                for week, week_data in group.groupby('week'):
+                    total_quantity = week_data['Quantity'].sum()  # Sumar la cantidad total vendida en la semana
+                    weekly_ingredients.loc[week] += total_quantity * product_ingredients  # Multiplicar por los insumos
 
     # Guardar el resultado en un archivo CSV
     weekly_ingredients.to_csv(ingredient_series_data)
@@ -74,20 +102,30 @@ sales_data_path = 'clean_sales_data.csv'
 ingredient_data_path = 'cleaned_ingredient_data.csv'
 ingredient_series_data = 'weekly_ingredients.csv'
 output_folder = 'ingredient_time_series'
+cube_dir = 'cubo_series'  # Cubo generado por series_productos.py (si existe, se usa directamente)
 
 # Lista de ingredientes seleccionados para analizar
 selected_ingredients = ['Harina de Trigo (g)', 'Manteca (g)', 'Sal (g)', 'Azúcar (g)']
 
 # Generar las series de tiempo semanales y guardarlas en un archivo CSV
-generate_weekly_ingredient_series(
-    sales_data_path, 
-    ingredient_data_path, 
-    selected_ingredients, 
-    ingredient_series_data
-)
+if os.path.exists(os.path.join(cube_dir, 'meta.json')):
+    weekly_ingredient_series_from_cube(cube_dir, selected_ingredients, ingredient_series_data)
+else:
+    generate_weekly_ingredient_series(
+        sales_data_path, 
+        ingredient_data_path, 
+        selected_ingredients, 
+        ingredient_series_data
+    )
 
 # Generar gráficos para las series de tiempo guardadas
-plot_weekly_ingredient_series(
-    ingredient_series_data, 
-    output_folder
-)
+with EscritorAsincrono() as writer:
+    plot_weekly_ingredient_series(
+        ingredient_series_data, 
+        output_folder,
+        writer=writer
+    )
+print(f"Gráficos generados y guardados en la carpeta '{output_folder}'.")
+
+# Exportar el perfilado de etapas (solo si IO_TPI_PROFILE está definida)
+profiling.export()
@@ -2,6 +2,10 @@ import os
 import pandas as pd
 import matplotlib.pyplot as plt
 from utils import load_and_clean_data
+import profiling
+from escritor_salidas import EscritorAsincrono
+from cubo_series import CuboSeries
+import backend_duckdb
 
 
 def load_and_prepare_data(input_file):
@@ -26,14 +30,19 @@ def create_time_series(data, freq='D'):
     Crea las series de tiempo para cada producto según la frecuencia especificada.
 
     Parámetros:
-    - data: pd.DataFrame, datos de ventas con 'MeasuredDemand'.
+    - data: pd.DataFrame, datos de ventas con 'MeasuredDemand', o ventas en parquet particionado
+      (FuenteParticionada o ruta), que se agregan con DuckDB sin cargarlas en memoria.
     - freq: str, frecuencia de agrupamiento (por defecto es diaria, es decir, 'D')
 
     Devuelve:
     - pd.DataFrame con las series de tiempo de cada producto.
     """
+    if backend_duckdb.es_fuente_particionada(data):
+        return backend_duckdb.series_por_articulo(data, freq)
+
     # Agrupar por artículo y fecha, sumando la demanda medida
-    data_grouped = data.groupby(['article', pd.Grouper(key='date', freq=freq)])['MeasuredDemand'].sum().reset_index()
+    with profiling.stage('create_time_series_groupby', filas=len(data), freq=freq):
+        data_grouped = data.groupby(['article', pd.Grouper(key='date', freq=freq)])['MeasuredDemand'].sum().reset_index()
 
     # Crear el rango de fechas completo
     min_date = data_grouped['date'].min()
@@ -44,15 +53,16 @@ def create_time_series(data, freq='D'):
     time_series_df = pd.DataFrame({'date': all_days})
 
     # Agregar las series temporales de cada producto
-    for producto in data_grouped['article'].unique():
-        
-        # Filtrar y ajustar las fechas de cada producto
-        producto_data = data_grouped[data_grouped['article'] == producto]
-        producto_data = producto_data.set_index('date').reindex(all_days, fill_value=0).reset_index()
-        producto_data.rename(columns={'index': 'date', 'MeasuredDemand': producto}, inplace=True)
+    with profiling.stage('create_time_series_merge', filas=len(data_grouped)):
+        for producto in data_grouped['article'].unique():
+
+            # Filtrar y ajustar las fechas de cada producto
+            producto_data = data_grouped[data_grouped['article'] == producto]
+            producto_data = producto_data.set_index('date').reindex(all_days, fill_value=0).reset_index()
+            producto_data.rename(columns={'index': 'date', 'MeasuredDemand': producto}, inplace=True)
 
-        # Unir los datos del producto con el DataFrame general
-        time_series_df = time_series_df.merge(producto_data[['date', producto]], on='date', how='left')
+            # Unir los datos del producto con el DataFrame general
+            time_series_df = time_series_df.merge(producto_data[['date', producto]], on='date', how='left')
 
     return time_series_df
 
@@ -69,30 +79,35 @@ def save_time_series_to_csv(time_series_df, output_file):
     print(f"Series temporales guardadas en {output_file}")
 
 
-def save_time_series_plots(time_series_df, output_dir):
+def save_time_series_plots(time_series_df, output_dir, writer=None):
     """
     Crea y guarda gráficos de las series de tiempo de cada producto en un directorio.
 
     Parámetros:
     - time_series_df: pd.DataFrame, DataFrame con las series de tiempo de los productos.
     - output_dir: str, ruta del directorio donde se guardarán los gráficos.
+    - writer: EscritorAsincrono opcional; si se indica, los archivos se escriben en segundo plano.
     """
     # Crear el directorio si no existe
     os.makedirs(output_dir, exist_ok=True)
 
     # Crear y guardar gráficos para cada producto
     for producto in time_series_df.columns[1:]:  # Ignorar la columna 'date'
-        fig, ax = plt.subplots(figsize=(10, 5))
-        ax.plot(time_series_df['date'], time_series_df[producto], marker='o')
-        ax.set_title(f'Serie de Tiempo para {producto}')
-        ax.set_xlabel('Fecha')
-        ax.set_ylabel('Demanda Medida')
-
-        # Guardar cada gráfico como imagen
-        output_file = os.path.join(output_dir, f'{producto}_time_series.png')
-        plt.tight_layout()
-        plt.savefig(output_file)
-        plt.close(fig)  # Cerrar la figura para liberar memoria
+        with profiling.stage('save_time_series_plot', serie=producto, filas=len(time_series_df)):
+            fig, ax = plt.subplots(figsize=(10, 5))
+            ax.plot(time_series_df['date'], time_series_df[producto], marker='o')
+            ax.set_title(f'Serie de Tiempo para {producto}')
+            ax.set_xlabel('Fecha')
+            ax.set_ylabel('Demanda Medida')
+
+            # Guardar cada gráfico como imagen
+            output_file = os.path.join(output_dir, f'{producto}_time_series.png')
+            plt.tight_layout()
+            if writer is not None:
+                writer.guardar_figura(fig, output_file)
+            else:
+                plt.savefig(output_file)
+                plt.close(fig)  # Cerrar la figura para liberar memoria
 
 
 def load_class_a_products(output_file):
@@ -119,8 +134,10 @@ input_file = 'Bakery sales.csv'  # Dataset original
 class_a_file = 'class_a_products.txt'  # Archivo con productos de clase A
 output_dir_base = 'products_time_series'  # Carpeta base para gráficos
 csv_output_file = 'products_time_series.csv'  # Archivo CSV de series de tiempo
+ingredient_data_path = 'cleaned_ingredient_data.csv'  # Insumos por producto
+cube_dir = 'cubo_series'  # Cubo con todas las frecuencias (D, W, M, Q) para productos e insumos
 
-# Elegir la frecuencia (puede ser 'D', 'W', o 'M')
+# Elegir la frecuencia (puede ser 'D', 'W', 'M' o 'Q')
 freq = 'W'
 output_dir = os.path.join(output_dir_base, freq)  # Crear subcarpeta para esa frecuencia
 
@@ -129,9 +146,19 @@ data = load_and_prepare_data(input_file)  # Datos de ventas
 class_a_products = load_class_a_products(class_a_file)  # Productos de clase A
 data_class_a = data[data['article'].isin(class_a_products)]  # Filtrar datos para productos de clase A
 
-# Crear las series de tiempo según la frecuencia elegida
-time_series_df = create_time_series(data_class_a, freq=freq)
+# Construir el cubo una sola vez (todas las frecuencias) y guardarlo para consultas posteriores
+ingredient_data = pd.read_csv(ingredient_data_path, index_col=0, encoding='utf-8-sig')
+cube = CuboSeries.construir(data, ingredient_data)
+cube.guardar(cube_dir)
+
+# Crear las series de tiempo según la frecuencia elegida (mismo formato que create_time_series)
+products = sorted(set(class_a_products) & set(cube.articulos))
+time_series_df = cube.serie(freq=freq, medida='MeasuredDemand', articulos=products).reset_index()
 
 # Guardar las series temporales
 save_time_series_to_csv(time_series_df, csv_output_file)  # Guardar archivo CSV
-save_time_series_plots(time_series_df, output_dir)  # Guardar gráficos
+with EscritorAsincrono() as writer:
+    save_time_series_plots(time_series_df, output_dir, writer=writer)  # Guardar gráficos
+
+# Exportar el perfilado de etapas (solo si IO_TPI_PROFILE está definida)
+profiling.export()
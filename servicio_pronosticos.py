@@ -0,0 +1,224 @@
+import os
+import json
+import time
+import queue
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+import numpy as np
+import pandas as pd
+from scipy.special import ndtri
+import profiling
+from forecast_models import load_data, fit_sarima_model, fit_sarima_batch
+
+
+class ServicioPronosticos:
+    """
+    Servicio local de pronósticos de insumos sobre modelos SARIMA ajustados.
+
+    Los modelos ajustados se guardan en una caché LRU, junto con el pronóstico más largo
+    calculado para cada insumo: cualquier pedido de un horizonte menor o igual se responde
+    recortando ese pronóstico, sin volver a tocar el modelo. Los pedidos concurrentes se
+    agrupan durante `ventana_lote` segundos y cada insumo se pronostica una sola vez con el
+    horizonte máximo pedido. Cada insumo se ajusta por separado, así que su modelo (y su
+    pronóstico) no depende de qué otros pedidos compartieron el lote.
+
+    Si cambia el archivo de datos, la caché se invalida en el siguiente pedido.
+
+    Parámetros:
+    - filepath: str, CSV con las series semanales de insumos.
+    - capacidad: int, cantidad máxima de modelos en caché.
+    - ventana_lote: float, segundos que se espera para juntar pedidos concurrentes.
+    - order, seasonal_order: estructura SARIMA.
+    - batched: bool, ajustar con el motor vectorizado (sarima_lotes) en lugar de SARIMAX.
+    """
+
+    def __init__(self, filepath='weekly_ingredients.csv', capacidad=32, ventana_lote=0.005,
+                 order=(1, 1, 1), seasonal_order=(1, 1, 1, 52), batched=True):
+        self.filepath = filepath
+        self.capacidad = capacidad
+        self.ventana_lote = ventana_lote
+        self.order = order
+        self.seasonal_order = seasonal_order
+        self.batched = batched
+        self._modelos = OrderedDict()  # insumo -> {'resultado', 'media', 'error'}
+        self._datos = None
+        self._version_datos = None
+        self._cola = queue.Queue()
+        self._despachador = threading.Thread(target=self._despachar, daemon=True)
+        self._despachador.start()
+
+    def forecast(self, ingredient, steps=48, quantiles=(0.05, 0.5, 0.95)):
+        """
+        Pronostica un insumo.
+
+        Parámetros:
+        - ingredient: str, nombre de la columna del insumo (por ejemplo 'Harina de Trigo (g)').
+        - steps: int, semanas a pronosticar.
+        - quantiles: secuencia de cuantiles a devolver, cada uno entre 0 y 1 excluidos
+          (supuesto de normalidad).
+
+        Devuelve:
+        - pd.DataFrame con índice de fechas y columnas 'mean' y 'q<cuantil>', recortadas en 0.
+        """
+        return self.forecast_many([(ingredient, steps, quantiles)])[0]
+
+    def forecast_many(self, pedidos):
+        """
+        Pronostica varios insumos en un único lote.
+
+        Parámetros:
+        - pedidos: lista de tuplas (ingredient, steps, quantiles).
+
+        Devuelve:
+        - list de pd.DataFrame, en el mismo orden que los pedidos.
+
+        Lanza:
+        - ValueError si algún cuantil no está en (0, 1) o algún horizonte no es positivo.
+        """
+        for _, steps, quantiles in pedidos:
+            if int(steps) < 1:
+                raise ValueError(f"El horizonte debe ser positivo: {steps}.")
+            if any(not 0 < q < 1 for q in quantiles):
+                raise ValueError(f"Los cuantiles deben estar entre 0 y 1 (excluidos): {list(quantiles)}.")
+
+        futuros = []
+        for ingredient, steps, quantiles in pedidos:
+            futuro = Future()
+            self._cola.put((ingredient, int(steps), tuple(quantiles), futuro))
+            futuros.append(futuro)
+        return [futuro.result() for futuro in futuros]
+
+    def _despachar(self):
+        while True:
+            lote = [self._cola.get()]
+            limite = time.perf_counter() + self.ventana_lote
+            while True:
+                restante = limite - time.perf_counter()
+                if restante <= 0:
+                    break
+                try:
+                    lote.append(self._cola.get(timeout=restante))
+                except queue.Empty:
+                    break
+
+            try:
+                with profiling.stage('servir_pronosticos', filas=len(lote)):
+                    self._resolver(lote)
+            except Exception as error:
+                for *_, futuro in lote:
+                    if not futuro.done():
+                        futuro.set_exception(error)
+
+    def _resolver(self, lote):
+        self._refrescar_datos()
+
+        # Horizonte máximo pedido por insumo
+        horizontes = {}
+        for ingredient, steps, _, futuro in lote:
+            if ingredient not in self._datos.columns:
+                futuro.set_exception(KeyError(f"Insumo desconocido: {ingredient}"))
+                continue
+            horizontes[ingredient] = max(steps, horizontes.get(ingredient, 0))
+
+        self._asegurar_modelos(list(horizontes))
+        for ingredient, steps in horizontes.items():
+            modelo = self._modelos[ingredient]
+            if modelo['media'] is None or len(modelo['media']) < steps:
+                pronostico = modelo['resultado'].get_forecast(steps=steps)
+                modelo['media'] = pronostico.predicted_mean
+                modelo['error'] = pd.Series(np.asarray(pronostico.se_mean), index=pronostico.predicted_mean.index)
+
+        for ingredient, steps, quantiles, futuro in lote:
+            if futuro.done():
+                continue
+            modelo = self._modelos[ingredient]
+            media = modelo['media'].iloc[:steps]
+            error = modelo['error'].iloc[:steps].to_numpy()
+            respuesta = pd.DataFrame({'mean': media.to_numpy()}, index=media.index)
+            for q in quantiles:
+                respuesta[f'q{q}'] = media.to_numpy() + ndtri(q) * error
+            # Sin consumos negativos, como en forecast_models.generate_forecasts
+            futuro.set_result(respuesta.clip(lower=0))
+
+    def _refrescar_datos(self):
+        version = os.path.getmtime(self.filepath)
+        if version != self._version_datos:
+            self._datos = load_data(self.filepath)
+            self._version_datos = version
+            self._modelos.clear()
+
+    def _asegurar_modelos(self, ingredientes):
+        faltantes = [i for i in ingredientes if i not in self._modelos]
+        for ingredient in faltantes:
+            # Un ajuste por insumo: el resultado no depende de los otros insumos del lote
+            if self.batched:
+                resultado = fit_sarima_batch(self._datos[[ingredient]], order=self.order, seasonal_order=self.seasonal_order)[ingredient]
+            else:
+                resultado = fit_sarima_model(self._datos[ingredient], order=self.order, seasonal_order=self.seasonal_order)
+            self._modelos[ingredient] = {'resultado': resultado, 'media': None, 'error': None}
+
+        # Actualizar el orden de uso y descartar los modelos menos usados
+        for ingredient in ingredientes:
+            self._modelos.move_to_end(ingredient)
+        while len(self._modelos) > max(self.capacidad, len(ingredientes)):
+            self._modelos.popitem(last=False)
+
+
+def crear_servidor(servicio, host='127.0.0.1', port=8050):
+    """
+    Crea el servidor HTTP del servicio (sin ponerlo a escuchar).
+
+    GET /forecast?ingredient=Harina%20de%20Trigo%20(g)&steps=12&quantiles=0.05,0.95
+    devuelve JSON con fechas, media y cuantiles. Un pedido inválido (insumo desconocido,
+    parámetros mal formados) devuelve 400 con un JSON {"error": ...}. Cada pedido se
+    atiende en su propio hilo y los pedidos simultáneos se agrupan en el servicio.
+
+    Devuelve:
+    - ThreadingHTTPServer.
+    """
+    class Manejador(BaseHTTPRequestHandler):
+        def _enviar_json(self, estado, datos):
+            cuerpo = json.dumps(datos, ensure_ascii=False).encode('utf-8')
+            self.send_response(estado)
+            self.send_header('Content-Type', 'application/json; charset=utf-8')
+            self.send_header('Content-Length', str(len(cuerpo)))
+            self.end_headers()
+            self.wfile.write(cuerpo)
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            if url.path != '/forecast':
+                self.send_error(404)
+                return
+            parametros = parse_qs(url.query)
+            try:
+                ingredient = parametros['ingredient'][0]
+                steps = int(parametros.get('steps', ['48'])[0])
+                quantiles = [float(q) for q in parametros.get('quantiles', ['0.05,0.5,0.95'])[0].split(',') if q]
+                respuesta = servicio.forecast(ingredient, steps, quantiles)
+            except (KeyError, ValueError) as error:
+                # El mensaje va en el cuerpo (UTF-8): la frase de estado sólo admite latin-1
+                mensaje = error.args[0] if isinstance(error, KeyError) and error.args else str(error)
+                self._enviar_json(400, {'error': str(mensaje)})
+                return
+            self._enviar_json(200, {
+                'ingredient': ingredient,
+                'dates': [d.strftime('%Y-%m-%d') for d in respuesta.index],
+                **{columna: np.round(respuesta[columna].to_numpy(), 6).tolist() for columna in respuesta.columns},
+            })
+
+    return ThreadingHTTPServer((host, port), Manejador)
+
+
+def servir(servicio, host='127.0.0.1', port=8050):
+    """Expone el servicio por HTTP en la máquina local (ver crear_servidor)."""
+    servidor = crear_servidor(servicio, host, port)
+    print(f'Servicio de pronósticos escuchando en http://{host}:{port}/forecast')
+    servidor.serve_forever()
+
+
+if __name__ == "__main__":
+    servir(ServicioPronosticos())
@@ -0,0 +1,246 @@
+import os
+import numpy as np
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+import profiling
+from montecarlo_paralelo import EstadisticasParciales
+from deteccion_temporadas import nombre_insumo
+
+
+def escenarios_demanda(pronostico, sigma, n_escenarios, semanas=52, rng=None):
+    """
+    Genera escenarios de demanda semanal alrededor del pronóstico.
+
+    El pronóstico de cada insumo se repite cíclicamente (fila por fila) hasta cubrir `semanas`
+    y a cada semana se le suma un error normal con el desvío del insumo; la demanda se trunca en cero.
+
+    Parámetros:
+    - pronostico: np.ndarray (insumos, horizonte), demanda media semanal.
+    - sigma: np.ndarray (insumos,), desvío del error semanal de pronóstico.
+    - n_escenarios: int, cantidad de escenarios.
+    - semanas: int, semanas a simular.
+    - rng: np.random.Generator.
+
+    Devuelve:
+    - np.ndarray (escenarios, insumos, semanas).
+    """
+    rng = rng or np.random.default_rng()
+    pronostico = np.asarray(pronostico, dtype=np.float64)
+    media = np.tile(pronostico, (1, -(-semanas // pronostico.shape[1])))[:, :semanas]
+    ruido = rng.standard_normal((n_escenarios,) + media.shape) * np.asarray(sigma, dtype=np.float64)[:, None]
+    return np.maximum(media + ruido, 0)
+
+
+def simular_politicas(demanda, q, r, costo_orden, c1, b, costo_faltante, tiempo_reposicion=1, stock_inicial=None):
+    """
+    Simula políticas (q, r) de revisión continua semana a semana para todos los escenarios,
+    insumos y políticas a la vez, con ventas perdidas.
+
+    Cada semana llega el pedido lanzado hace `tiempo_reposicion` semanas, se atiende la demanda
+    con el stock disponible (lo que falta se pierde) y, si la posición de inventario (stock más
+    pedidos en camino) quedó en r o menos, se pide q.
+
+    Los costos siguen los términos de calcular_cte: k por pedido, c1 por el stock promedio del
+    horizonte, b por kg recibido (los pedidos que siguen en camino al final del horizonte no se
+    pagan, para no penalizar puntos de pedido altos) y `costo_faltante` por kg de demanda no atendida.
+
+    Parámetros:
+    - demanda: np.ndarray (escenarios, insumos, semanas).
+    - q, r: np.ndarray (insumos, políticas), tamaño de lote y punto de pedido.
+    - costo_orden: float, costo por pedido.
+    - c1, b, costo_faltante: np.ndarray (insumos,).
+    - tiempo_reposicion: int >= 1, semanas entre el pedido y la llegada.
+    - stock_inicial: np.ndarray (insumos, políticas), por defecto r + q.
+
+    Devuelve:
+    - dict con arrays (escenarios, insumos, políticas): 'Costo', 'Semanas_Quiebre',
+      'Demanda' y 'Atendida'.
+    """
+    n_escenarios, n_insumos, n_semanas = demanda.shape
+    q = np.asarray(q, dtype=np.float64)
+    r = np.asarray(r, dtype=np.float64)
+    c1, b, costo_faltante = (np.asarray(x, dtype=np.float64)[:, None] for x in (c1, b, costo_faltante))
+    forma = (n_escenarios,) + q.shape
+
+    stock = np.broadcast_to(r + q if stock_inicial is None else stock_inicial, forma).copy()
+    en_camino = np.zeros((tiempo_reposicion,) + forma)  # en_camino[j]: llega dentro de j semanas
+    pedidos = np.zeros(forma)
+    recibido = np.zeros(forma)
+    stock_acumulado = np.zeros(forma)
+    atendida = np.zeros(forma)
+    semanas_quiebre = np.zeros(forma)
+    pedido = np.empty(forma, dtype=bool)
+
+    for semana in range(n_semanas):
+        stock += en_camino[0]
+        recibido += en_camino[0]
+        en_camino[:-1] = en_camino[1:]
+        en_camino[-1] = 0
+
+        demanda_semana = demanda[:, :, semana, None]
+        venta = np.minimum(stock, demanda_semana)
+        stock -= venta
+        atendida += venta
+        semanas_quiebre += venta < demanda_semana
+        stock_acumulado += stock
+
+        np.less_equal(stock + en_camino.sum(axis=0), r, out=pedido)
+        en_camino[-1] += pedido * q
+        pedidos += pedido
+
+    demanda_total = np.broadcast_to(demanda.sum(axis=2)[:, :, None], forma)
+    costo = (pedidos * costo_orden
+             + c1 * stock_acumulado / n_semanas
+             + b * recibido
+             + costo_faltante * (demanda_total - atendida))
+    return {'Costo': costo, 'Semanas_Quiebre': semanas_quiebre, 'Demanda': demanda_total, 'Atendida': atendida}
+
+
+def politicas_candidatas(pronostico, sigma, lotes, factores_seguridad=(0, 0.5, 1, 1.5, 2, 3), tiempo_reposicion=1):
+    """
+    Arma la grilla de políticas de cada insumo: cada lote candidato combinado con puntos de
+    pedido r = demanda media en la reposición + z·σ·√L para cada z de `factores_seguridad`.
+
+    Parámetros:
+    - pronostico: np.ndarray (insumos, horizonte), demanda media semanal.
+    - sigma: np.ndarray (insumos,), desvío del error semanal.
+    - lotes: np.ndarray (insumos, lotes), tamaños de lote candidatos.
+    - factores_seguridad: secuencia de z.
+    - tiempo_reposicion: int, semanas de reposición.
+
+    Devuelve:
+    - tuple (q, r), arrays (insumos, lotes * factores).
+    """
+    lotes = np.asarray(lotes, dtype=np.float64)
+    z = np.asarray(factores_seguridad, dtype=np.float64)
+    demanda_reposicion = np.asarray(pronostico, dtype=np.float64).mean(axis=1) * tiempo_reposicion
+    puntos = demanda_reposicion[:, None] + z[None, :] * np.asarray(sigma, dtype=np.float64)[:, None] * np.sqrt(tiempo_reposicion)
+    q = np.repeat(lotes, len(z), axis=1)
+    r = np.tile(puntos, (1, lotes.shape[1]))
+    return q, r
+
+
+def _simular_bloque(argumentos):
+    """Simula un bloque de escenarios (se ejecuta en un proceso del pool)."""
+    pronostico, sigma, n, semilla, semanas, q, r, parametros = argumentos
+    demanda = escenarios_demanda(pronostico, sigma, n, semanas, np.random.default_rng(semilla))
+    resultado = simular_politicas(demanda, q, r, **parametros)
+    return (EstadisticasParciales.desde_valores(resultado['Costo']),
+            resultado['Semanas_Quiebre'].sum(axis=0), resultado['Demanda'].sum(axis=0), resultado['Atendida'].sum(axis=0))
+
+
+def evaluar_politicas(nombres, pronostico, sigma, q, r, costo_orden, c1, b, costo_faltante, n_escenarios=1000,
+                      semanas=52, tiempo_reposicion=1, semilla=None, tam_bloque=250, trabajadores=1):
+    """
+    Evalúa todas las políticas sobre escenarios de demanda, por bloques de escenarios.
+
+    Cada bloque genera sus escenarios con su propia semilla (SeedSequence.spawn) y sus resultados
+    se combinan en orden, así que el resultado no depende de la cantidad de procesos. El tamaño
+    del bloque acota la memoria: (bloque, insumos, políticas) por variable de estado.
+
+    Parámetros:
+    - nombres: list, nombre de cada insumo.
+    - pronostico, sigma: ver escenarios_demanda.
+    - q, r: np.ndarray (insumos, políticas).
+    - costo_orden, c1, b, costo_faltante: ver simular_politicas. costo_faltante debe superar a b:
+      un kg perdido ahorra su compra, así que con costo_faltante <= b faltar no cuesta nada y
+      siempre convendría la política con menor nivel de servicio.
+    - n_escenarios: int, escenarios por insumo.
+    - semanas: int, horizonte simulado.
+    - tiempo_reposicion: int, semanas de reposición.
+    - semilla: int, semilla raíz.
+    - tam_bloque: int, escenarios por bloque.
+    - trabajadores: int, procesos (1 ejecuta en el proceso actual; None usa todos los núcleos).
+
+    Devuelve:
+    - pd.DataFrame con una fila por insumo y política: q, r, Costo_Medio, Costo_DE,
+      Tasa_Quiebre (fracción de semanas con faltante) y Nivel_Servicio (fill rate).
+
+    Lanza:
+    - ValueError si costo_faltante no supera a b para algún insumo.
+    """
+    if np.any(np.asarray(costo_faltante, dtype=np.float64) <= np.asarray(b, dtype=np.float64)):
+        raise ValueError("costo_faltante debe ser mayor que b (precio de compra) para todos los insumos.")
+    parametros = {
+        'costo_orden': costo_orden, 'c1': c1, 'b': b,
+        'costo_faltante': costo_faltante,
+        'tiempo_reposicion': tiempo_reposicion,
+    }
+    tamanos = [min(tam_bloque, n_escenarios - inicio) for inicio in range(0, n_escenarios, tam_bloque)]
+    semillas = np.random.SeedSequence(semilla).spawn(len(tamanos))
+    argumentos = [(pronostico, sigma, n, s, semanas, q, r, parametros) for n, s in zip(tamanos, semillas)]
+
+    trabajadores = trabajadores or os.cpu_count() or 1
+    with profiling.stage('simular_politicas', filas=n_escenarios * np.size(q) * semanas, trabajadores=trabajadores):
+        if trabajadores == 1:
+            parciales = list(map(_simular_bloque, argumentos))
+        else:
+            with ProcessPoolExecutor(max_workers=trabajadores) as pool:
+                parciales = profiling.map_procesos(pool, _simular_bloque, argumentos)
+
+    costo, quiebres, demanda, atendida = parciales[0]
+    for otro_costo, otros_quiebres, otra_demanda, otra_atendida in parciales[1:]:
+        costo = costo.combinar(otro_costo)
+        quiebres, demanda, atendida = quiebres + otros_quiebres, demanda + otra_demanda, atendida + otra_atendida
+
+    n_insumos, n_politicas = np.shape(q)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        nivel_servicio = np.where(demanda > 0, atendida / demanda, 1.0)
+    return pd.DataFrame({
+        'Insumo': np.repeat(nombres, n_politicas),
+        'Politica': np.tile(np.arange(1, n_politicas + 1), n_insumos),
+        'q': np.ravel(q),
+        'r': np.ravel(r),
+        'Costo_Medio': costo.media.ravel(),
+        'Costo_DE': costo.de.ravel(),
+        'Tasa_Quiebre': (quiebres / (n_escenarios * semanas)).ravel(),
+        'Nivel_Servicio': nivel_servicio.ravel(),
+    })
+
+
+# Costo de un kg de demanda no atendida, como recargo sobre el precio de compra b
+# (margen perdido de los productos que no se pueden elaborar)
+recargo_faltante = 1.0
+
+
+def main():
+    """
+    Simula las políticas (q, r) de cada insumo sobre escenarios construidos con los pronósticos
+    de forecast_models.py y guarda los resultados en simulacion_politicas.csv.
+    """
+    from parametros_inventario import temporadas, insumos, valores_q, costo_orden
+
+    # Pronósticos semanales (g -> kg), con el nombre del insumo sin unidad
+    pronosticos = pd.read_csv('ingredient_forecasts.csv', index_col=0, encoding='utf-8-sig') * 0.001
+    pronosticos.columns = [nombre_insumo(c) for c in pronosticos.columns]
+    nombres = [n for n in pronosticos.columns if n in insumos]
+    pronostico = pronosticos[nombres].to_numpy().T
+
+    # Desvío del error semanal: errores de validación si existen, si no el D.E. medio de las temporadas
+    sigma = np.array([np.mean([t["demandas"][n]["de"] for t in temporadas]) for n in nombres])
+    errores_path = os.path.join('error_prediction', 'errores_semanales.csv')
+    if os.path.exists(errores_path):
+        errores = pd.read_csv(errores_path)
+        sigma_errores = errores.groupby(errores['Serie'].map(nombre_insumo))['Error'].std().reindex(nombres).to_numpy() * 0.001
+        sigma = np.where(np.isnan(sigma_errores), sigma, sigma_errores)
+
+    lotes = np.array([[valores[n] for valores in valores_q.values()] for n in nombres])
+    q, r = politicas_candidatas(pronostico, sigma, lotes)
+    b = np.array([insumos[n]["b"] for n in nombres])
+    resultados = evaluar_politicas(
+        nombres, pronostico, sigma, q, r, costo_orden,
+        c1=np.array([insumos[n]["c1"] for n in nombres]),
+        b=b,
+        costo_faltante=b * (1 + recargo_faltante),
+        n_escenarios=2000, semilla=2024, trabajadores=None,
+    )
+    resultados.to_csv('simulacion_politicas.csv', index=False, encoding='utf-8-sig')
+    print('Resultados guardados en: simulacion_politicas.csv')
+
+    mejores = resultados.loc[resultados.groupby('Insumo')['Costo_Medio'].idxmin()]
+    print(mejores[['Insumo', 'q', 'r', 'Costo_Medio', 'Tasa_Quiebre', 'Nivel_Servicio']].to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
+    profiling.export()
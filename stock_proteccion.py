@@ -0,0 +1,166 @@
+import copy
+import warnings
+import numpy as np
+import pandas as pd
+from scipy.special import ndtri
+import profiling
+from deteccion_temporadas import nombre_insumo
+
+METODOS_SP = ('empirico', 'normal', 'bootstrap')
+
+
+def temporada_por_semana(temporadas):
+    """
+    Índice de temporada de cada semana del año (posiciones 1 a 53; -1 si ninguna la cubre).
+
+    Usa las semanas detectadas ("semanas": [inicio, fin]) si están; si no, las temporadas se
+    toman consecutivas desde la semana 1 según su duración. La semana 53 de los años largos
+    queda en la temporada de la semana 52.
+    """
+    mapa = np.full(54, -1)
+    inicio = 1
+    for posicion, temporada_info in enumerate(temporadas):
+        desde, hasta = temporada_info.get("semanas", [inicio, inicio + temporada_info["duracion_temporada"] - 1])
+        mapa[desde:hasta + 1] = posicion
+        inicio = hasta + 1
+    if mapa[53] < 0:
+        mapa[53] = mapa[52]
+    return mapa
+
+
+def _apilar(grupos, valores, forma):
+    """Ubica los valores en un array (..., observaciones) completado con NaN, un renglón por grupo."""
+    grupos = tuple(np.asarray(g) for g in grupos)
+    posicion = pd.DataFrame(dict(enumerate(grupos))).groupby(list(range(len(grupos)))).cumcount().to_numpy()
+    apilado = np.full(forma + (max(posicion.max() + 1, 1) if len(posicion) else 1,), np.nan)
+    apilado[grupos + (posicion,)] = valores
+    return apilado
+
+
+def _cuantil_faltante(faltantes, nivel_servicio, metodo, semanas_reposicion, n_simulaciones, rng):
+    """
+    Cuantil del faltante acumulado en el tiempo de reposición, sobre el último eje (con NaN).
+
+    Los faltantes se centran en su media antes de calcular el cuantil: el sesgo del pronóstico
+    es un error sistemático que no debe absorber (ni anular) el stock de protección, que cubre
+    la variabilidad.
+
+    - 'empirico': cuantil de los faltantes semanales centrados, escalado por √L (semanas independientes).
+    - 'normal': z·σ·√L.
+    - 'bootstrap': cuantil de la suma de L faltantes centrados remuestreados, n_simulaciones veces.
+    """
+    L = semanas_reposicion
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning)  # combinaciones sin errores (todo NaN)
+        centrados = faltantes - np.nanmean(faltantes, axis=-1, keepdims=True)
+        if metodo == 'empirico':
+            return np.sqrt(L) * np.nanquantile(centrados, nivel_servicio, axis=-1)
+        if metodo == 'normal':
+            return ndtri(nivel_servicio) * np.nanstd(centrados, axis=-1, ddof=1) * np.sqrt(L)
+        if metodo != 'bootstrap':
+            raise ValueError(f"Método desconocido: {metodo}. Opciones: {', '.join(METODOS_SP)}.")
+
+        # Los NaN quedan al final al ordenar, así que los índices [0, n) son observaciones válidas
+        ordenados = np.sort(centrados, axis=-1)
+        n = (~np.isnan(centrados)).sum(axis=-1)
+        indices = (rng.random(centrados.shape[:-1] + (n_simulaciones * L,)) * n[..., None]).astype(np.int64)
+        sorteos = np.take_along_axis(ordenados, indices, axis=-1)
+        acumulados = sorteos.reshape(centrados.shape[:-1] + (n_simulaciones, L)).sum(axis=-1)
+        return np.where(n > 0, np.quantile(acumulados, nivel_servicio, axis=-1), np.nan)
+
+
+def calcular_stock_proteccion(errores, temporadas, nombres_insumos, nivel_servicio=0.95, metodo='empirico',
+                              semanas_reposicion=1, min_observaciones=8, n_simulaciones=10_000, semilla=None,
+                              factor_unidad=0.001):
+    """
+    Calcula el stock de protección de cada insumo en cada temporada a partir de los errores de pronóstico.
+
+    El faltante semanal es real - pronóstico. Los faltantes se ubican en un array
+    (temporadas, insumos, semanas) según la semana del año de cada error y se calcula el
+    cuantil del nivel de servicio para todas las combinaciones a la vez. Las combinaciones
+    con menos de `min_observaciones` errores, o cuyo cuantil no es positivo, usan el de todas
+    las temporadas juntas; si tampoco es positivo, quedan en NaN.
+
+    Parámetros:
+    - errores: pd.DataFrame en formato largo con columnas Serie, Fecha y Error
+      (pronóstico - real), como error_prediction/errores_semanales.csv.
+    - temporadas: list, temporadas con el formato de parametros_inventario.temporadas.
+    - nombres_insumos: list, insumos a incluir (sin unidad, por ejemplo 'Harina de Trigo').
+    - nivel_servicio: float, probabilidad de no quedarse sin stock durante la reposición.
+    - metodo: str, 'empirico', 'normal' o 'bootstrap'.
+    - semanas_reposicion: int, tiempo de reposición en semanas.
+    - min_observaciones: int, errores mínimos por temporada e insumo.
+    - n_simulaciones: int, sumas remuestreadas por combinación (sólo 'bootstrap').
+    - semilla: int, semilla del remuestreo.
+    - factor_unidad: float, conversión de la unidad de las series a kg (g -> kg por defecto).
+
+    Devuelve:
+    - pd.DataFrame (temporadas x insumos) con el stock de protección en kg (NaN si no se pudo estimar).
+    """
+    posicion_insumo = {insumo: i for i, insumo in enumerate(nombres_insumos)}
+    insumo = errores['Serie'].map(nombre_insumo).map(posicion_insumo)
+    validos = insumo.notna() & errores['Error'].notna()
+    errores, insumo = errores[validos], insumo[validos].to_numpy(dtype=np.int64)
+
+    semana = pd.to_datetime(errores['Fecha']).dt.isocalendar().week.to_numpy(dtype=np.int64)
+    temporada = temporada_por_semana(temporadas)[semana]
+    faltantes = -errores['Error'].to_numpy(dtype=np.float64) * factor_unidad
+
+    rng = np.random.default_rng(semilla)
+    n_temporadas, n_insumos = len(temporadas), len(nombres_insumos)
+    with profiling.stage('calcular_stock_proteccion', filas=len(faltantes), metodo=metodo):
+        en_temporada = temporada >= 0
+        por_temporada = _apilar((temporada[en_temporada], insumo[en_temporada]), faltantes[en_temporada], (n_temporadas, n_insumos))
+        agrupado = _apilar((insumo,), faltantes, (n_insumos,))
+
+        sp = _cuantil_faltante(por_temporada, nivel_servicio, metodo, semanas_reposicion, n_simulaciones, rng)
+        sp_agrupado = _cuantil_faltante(agrupado, nivel_servicio, metodo, semanas_reposicion, n_simulaciones, rng)
+        pocos = (~np.isnan(por_temporada)).sum(axis=-1) < min_observaciones
+        sp = np.where(pocos | ~(sp > 0), sp_agrupado[None, :], sp)
+        sp = np.where(sp > 0, sp, np.nan)
+
+    return pd.DataFrame(sp, index=pd.Index([t["nombre"] for t in temporadas], name='Temporada'),
+                        columns=list(nombres_insumos))
+
+
+def agregar_stock_proteccion(temporadas, errores_path='error_prediction/errores_semanales.csv', **kwargs):
+    """
+    Devuelve una copia de las temporadas con el stock de protección calculado ("Sp", kg) en la
+    demanda de cada insumo. Las combinaciones sin errores suficientes no reciben "Sp" y siguen
+    usando el valor fijo de parametros_inventario.insumos.
+
+    Parámetros:
+    - temporadas: list, temporadas con el formato de parametros_inventario.temporadas.
+    - errores_path: str, CSV de errores en formato largo (ver intercalated_validation).
+    - kwargs: ver calcular_stock_proteccion.
+    """
+    nombres_insumos = sorted({insumo for t in temporadas for insumo in t["demandas"]})
+    sp = calcular_stock_proteccion(pd.read_csv(errores_path), temporadas, nombres_insumos, **kwargs)
+
+    temporadas = copy.deepcopy(temporadas)
+    for posicion, temporada_info in enumerate(temporadas):
+        for insumo, datos in temporada_info["demandas"].items():
+            valor = sp.iloc[posicion][insumo]
+            if np.isfinite(valor):
+                datos["Sp"] = float(valor)
+    return temporadas
+
+
+def main():
+    """
+    Calcula el stock de protección por temporada e insumo con cada método y lo guarda en stock_proteccion.csv.
+    """
+    from parametros_inventario import temporadas, insumos
+    errores = pd.read_csv('error_prediction/errores_semanales.csv')
+    resultados = {}
+    for metodo in METODOS_SP:
+        resultados[metodo] = calcular_stock_proteccion(errores, temporadas, list(insumos), metodo=metodo, semilla=2024)
+        print(f"\nStock de protección (kg), método {metodo}:")
+        print(resultados[metodo].round(3))
+    pd.concat(resultados, names=['Metodo']).to_csv('stock_proteccion.csv', encoding='utf-8-sig')
+    print('Stock de protección guardado en: stock_proteccion.csv')
+
+
+if __name__ == "__main__":
+    main()
+    profiling.export()
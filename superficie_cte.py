@@ -0,0 +1,202 @@
+import os
+import numpy as np
+import pandas as pd
+import profiling
+from parametros_inventario import obtener_temporadas, stock_proteccion_insumo, insumos, valores_q, costo_orden
+
+# Si es True, las temporadas y sus demandas se detectan a partir de weekly_ingredients.csv
+temporadas_desde_datos = False
+# El stock de protección sale de los errores de pronóstico cuando existe error_prediction/errores_semanales.csv
+# (generado por intercalated_validation); si no, se usan los valores fijos
+sp_desde_errores = os.path.exists(os.path.join('error_prediction', 'errores_semanales.csv'))
+
+# Parámetros de la fórmula del CTE, en el orden en que se usan en calcular_cte
+PARAMETROS_CTE = ("d", "k", "q", "c1", "b", "Sp")
+
+
+def calcular_cte(d, k, q, c1, b, Sp):
+    """
+    Calcula el Costo Total Esperado (CTE).
+
+    Los argumentos pueden ser escalares o arrays de numpy con formas compatibles
+    (se aplica broadcasting), por lo que sirve tanto para un punto como para una grilla.
+
+    Args (float o np.ndarray):
+        d: Demanda total de la temporada (kg).
+        k: Costo de Orden ($).
+        q: Tamaño del Lote (kg).
+        c1: Costo unitario de Mantenimiento ($/kg).
+        b: Costo unitario de Adquisición ($).
+        Sp: Stock de Protección (kg).
+
+    Returns:
+        float o np.ndarray: Costo total esperado.
+    """
+    return (d * k / q) + (q * c1 / 2) + (d * b) + (Sp * c1)
+
+
+def evaluar_superficie_cte(d, k, q, c1, b, Sp, out=None):
+    """
+    Evalúa el CTE sobre una grilla N-dimensional usando broadcasting.
+
+    Cada parámetro debe tener una forma que haga broadcasting con el resto (por ejemplo,
+    un eje propio con tamaño > 1 y tamaño 1 en los demás). Solo el resultado ocupa la
+    grilla completa: los términos intermedios se calculan sobre los ejes de los que dependen
+    y se acumulan en el mismo array, de modo que una grilla de 10^7 puntos usa ~80 MB.
+
+    Args (float o np.ndarray):
+        d, k, q, c1, b, Sp: ver calcular_cte.
+        out: np.ndarray opcional donde escribir el resultado.
+
+    Returns:
+        np.ndarray: CTE para cada punto de la grilla.
+    """
+    forma = np.broadcast_shapes(*(np.shape(x) for x in (d, k, q, c1, b, Sp)))
+    if out is None:
+        out = np.empty(forma, dtype=np.float64)
+
+    np.multiply(d, k, out=out)
+    np.divide(out, q, out=out)
+    out += np.multiply(q, c1) / 2
+    out += np.multiply(d, b)
+    out += np.multiply(Sp, c1)
+    return out
+
+
+def construir_bases(temporadas, insumos, valores_q, costo_orden):
+    """
+    Arma los valores base de cada parámetro para cada combinación de temporada e insumo.
+
+    Args:
+        temporadas (list): Temporadas con duración y demanda media semanal por insumo.
+        insumos (dict): Costos y stock de protección por insumo.
+        valores_q (dict): Tamaños de lote por temporada e insumo.
+        costo_orden (float): Costo de orden ($).
+
+    Returns:
+        tuple: (pd.DataFrame con columnas Temporada e Insumo, dict parámetro -> np.ndarray de bases).
+    """
+    etiquetas = {"Temporada": [], "Insumo": []}
+    bases = {parametro: [] for parametro in PARAMETROS_CTE}
+
+    for temporada_info in temporadas:
+        temporada = temporada_info["nombre"]
+        lotes = valores_q.get(int(temporada), valores_q[1])
+        for insumo, datos in temporada_info["demandas"].items():
+            etiquetas["Temporada"].append(temporada)
+            etiquetas["Insumo"].append(insumo)
+            bases["d"].append(datos["media"] * temporada_info["duracion_temporada"])
+            bases["k"].append(costo_orden)
+            bases["q"].append(lotes[insumo])
+            bases["c1"].append(insumos[insumo]["c1"])
+            bases["b"].append(insumos[insumo]["b"])
+            bases["Sp"].append(stock_proteccion_insumo(temporada_info, insumo))
+
+    return pd.DataFrame(etiquetas), {p: np.asarray(v, dtype=np.float64) for p, v in bases.items()}
+
+
+def superficie_relativa(bases, factores):
+    """
+    Evalúa el CTE para todas las combinaciones a la vez, variando cada parámetro como
+    múltiplo de su valor base.
+
+    El resultado tiene forma (combinaciones, len(factores[p1]), len(factores[p2]), ...),
+    con un eje por parámetro de `factores` en el orden del diccionario. Los parámetros
+    que no están en `factores` quedan fijos en su valor base.
+
+    Args:
+        bases (dict): Parámetro -> np.ndarray con el valor base de cada combinación.
+        factores (dict): Parámetro -> np.ndarray 1-D de multiplicadores.
+
+    Returns:
+        np.ndarray: Superficie de CTE.
+    """
+    ejes = list(factores)
+    n_dim = len(ejes) + 1
+    valores = {}
+    for parametro in PARAMETROS_CTE:
+        base = bases[parametro].reshape((-1,) + (1,) * len(ejes))
+        if parametro in factores:
+            forma = [1] * n_dim
+            forma[ejes.index(parametro) + 1] = -1
+            base = base * np.asarray(factores[parametro], dtype=np.float64).reshape(forma)
+        valores[parametro] = base
+
+    with profiling.stage('superficie_cte') as etapa:
+        superficie = evaluar_superficie_cte(**valores)
+        etapa.record(filas=superficie.size)
+    return superficie
+
+
+def resumen_tornado(superficie, factores, etiquetas):
+    """
+    Calcula el resumen tipo tornado y las elasticidades del CTE a partir de la superficie.
+
+    Para cada parámetro se toma el corte de la superficie en el que el resto de los
+    parámetros está en su valor base (factor más cercano a 1). La elasticidad se estima
+    con diferencias finitas sobre ese corte: (dCTE/dx) * x / CTE en el punto base.
+
+    Args:
+        superficie (np.ndarray): Resultado de superficie_relativa.
+        factores (dict): Los mismos multiplicadores usados para la superficie.
+        etiquetas (pd.DataFrame): Temporada e Insumo de cada combinación.
+
+    Returns:
+        pd.DataFrame: Una fila por combinación y parámetro, ordenada por rango de CTE.
+    """
+    ejes = list(factores)
+    indices_base = [int(np.argmin(np.abs(np.asarray(factores[p]) - 1))) for p in ejes]
+    filas = []
+
+    for i, parametro in enumerate(ejes):
+        f = np.asarray(factores[parametro], dtype=np.float64)
+        corte = [slice(None)] + [slice(None) if j == i else indices_base[j] for j in range(len(ejes))]
+        curva = superficie[tuple(corte)]  # (combinaciones, len(f))
+
+        base = curva[:, indices_base[i]]
+        pendiente = np.gradient(curva, f, axis=1)[:, indices_base[i]]
+
+        resumen = etiquetas.copy()
+        resumen["Parametro"] = parametro
+        resumen["Factor_min"] = f.min()
+        resumen["Factor_max"] = f.max()
+        resumen["CTE_base"] = base
+        resumen["CTE_min"] = curva.min(axis=1)
+        resumen["CTE_max"] = curva.max(axis=1)
+        resumen["Rango"] = resumen["CTE_max"] - resumen["CTE_min"]
+        resumen["Elasticidad"] = pendiente * f[indices_base[i]] / base
+        filas.append(resumen)
+
+    tornado = pd.concat(filas, ignore_index=True)
+    return tornado.sort_values(["Temporada", "Insumo", "Rango"], ascending=[True, True, False]).reset_index(drop=True)
+
+
+def main():
+    """
+    Análisis de sensibilidad conjunto sobre demanda, costo de orden, lote, mantenimiento y precio.
+    """
+    output_dir = os.path.join('sensitivity', 'conjunta')
+    os.makedirs(output_dir, exist_ok=True)
+
+    etiquetas, bases = construir_bases(obtener_temporadas(temporadas_desde_datos, sp_desde_errores=sp_desde_errores), insumos, valores_q, costo_orden)
+
+    # Multiplicadores sobre el valor base (todos incluyen el 1 exacto)
+    factores = {
+        "d": np.linspace(0.5, 1.5, 11),
+        "k": np.linspace(0.5, 1.5, 11),
+        "q": np.linspace(0.25, 4, 31),
+        "c1": np.linspace(0.5, 1.5, 11),
+        "b": np.linspace(0.5, 1.5, 11),
+    }
+
+    superficie = superficie_relativa(bases, factores)
+    print(f"Superficie de CTE evaluada en {superficie.size} puntos.")
+
+    tornado = resumen_tornado(superficie, factores, etiquetas)
+    tornado.to_csv(os.path.join(output_dir, "tornado_cte.csv"), index=False)
+    print(f"Resumen tornado guardado en '{output_dir}/tornado_cte.csv'.")
+
+
+if __name__ == "__main__":
+    main()
+    profiling.export()
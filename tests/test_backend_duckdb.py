@@ -0,0 +1,26 @@
+import pandas as pd
+import pytest
+import backend_duckdb
+from utils import load_and_clean_data
+
+pytest.importorskip('duckdb')
+
+
+def test_particionar_ventas_acepta_precios_con_euro(tmp_path):
+    # Mismo formato que "Bakery sales.csv": el "€" en UTF-8 y, en la última fila, en cp1252 (byte 0x80)
+    ventas = tmp_path / 'ventas.csv'
+    ventas.write_bytes(
+        ',date,time,ticket_number,article,Quantity,unit_price\n'
+        '0,2021-01-02,08:38,150040,BAGUETTE,1,"0,90 €"\n'
+        '1,2021-01-02,08:38,150040,PAIN AU CHOCOLAT,3,"1,20 €"\n'
+        '2,2022-03-05,09:14,150041,BAGUETTE,2,"0,90 €"\n'.encode('utf-8')
+        + '3,2022-03-05,09:14,150041,CROISSANT,1,"1,10 €"\n'.encode('cp1252')
+    )
+
+    fuente = backend_duckdb.particionar_ventas(str(ventas), str(tmp_path / 'parquet'))
+    obtenido = backend_duckdb.demanda_por_articulo(fuente).set_index('article')['MeasuredDemand']
+
+    limpio = load_and_clean_data(str(ventas))
+    esperado = (limpio['Quantity'] * limpio['unit_price']).groupby(limpio['article']).sum()
+    pd.testing.assert_series_equal(obtenido, esperado, check_names=False, check_index_type=False)
+    assert obtenido['CROISSANT'] == pytest.approx(1.10)
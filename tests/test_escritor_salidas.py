@@ -0,0 +1,23 @@
+import pytest
+from escritor_salidas import EscritorAsincrono
+
+
+def test_error_de_escritura_se_relanza_al_cerrar(tmp_path):
+    (tmp_path / 'ocupado').mkdir()  # abrir un directorio como archivo falla
+
+    with pytest.raises(OSError):
+        with EscritorAsincrono(hilos=1) as escritor:
+            escritor.escribir_bytes(str(tmp_path / 'ocupado'), b'x')
+
+
+def test_error_de_escritura_no_oculta_la_excepcion_original(tmp_path):
+    (tmp_path / 'ocupado').mkdir()
+
+    with pytest.raises(RuntimeError, match='ajuste'):
+        with EscritorAsincrono(hilos=1) as escritor:
+            escritor.escribir_bytes(str(tmp_path / 'bien.txt'), b'y')
+            escritor.escribir_bytes(str(tmp_path / 'ocupado'), b'x')
+            raise RuntimeError('falló el ajuste')
+
+    # Lo encolado antes del error se escribe igual antes de propagar la excepción
+    assert (tmp_path / 'bien.txt').read_bytes() == b'y'
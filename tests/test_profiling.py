@@ -0,0 +1,47 @@
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+import pytest
+import profiling
+
+
+def _cuadrado(x):
+    with profiling.stage('interna', filas=x):
+        return x * x
+
+
+@pytest.fixture
+def perfilado():
+    profiling.clear()
+    profiling.enable()
+    yield
+    profiling.disable()
+    profiling.clear()
+
+
+def test_registros_de_los_trabajadores_vuelven_al_proceso_principal(perfilado):
+    with ProcessPoolExecutor(max_workers=2) as pool:
+        resultados = profiling.map_procesos(pool, _cuadrado, range(4))
+
+    assert resultados == [0, 1, 4, 9]
+    registros = profiling.records()
+    tareas = [r for r in registros if r['etapa'] == '_cuadrado']
+    internas = [r for r in registros if r['etapa'] == 'interna']
+    assert len(tareas) == 4 and sorted(r['filas'] for r in internas) == [0, 1, 2, 3]
+    assert all(r['pid'] != os.getpid() for r in tareas + internas)
+
+
+def test_etapas_fuera_del_hilo_principal_no_miden_memoria(perfilado):
+    def trabajo():
+        with profiling.stage('secundaria'):
+            bytearray(1 << 20)
+
+    with profiling.stage('principal'):
+        hilo = threading.Thread(target=trabajo)
+        hilo.start()
+        hilo.join()
+
+    registros = {r['etapa']: r for r in profiling.records()}
+    assert registros['secundaria']['memoria_pico_bytes'] is None
+    assert registros['secundaria']['memoria_pico_delta_bytes'] is None
+    assert registros['principal']['memoria_pico_bytes'] > 0
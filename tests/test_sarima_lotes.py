@@ -0,0 +1,80 @@
+import numpy as np
+import pandas as pd
+import pytest
+from scipy.linalg import solve_discrete_lyapunov
+from statsmodels.tsa.statespace.sarimax import SARIMAX
+from sarima_lotes import (EstructuraSARIMA, OPCIONES_SARIMAX, _polinomio_lotes, ajustar_sarima_lotes,
+                          covarianza_estacionaria)
+
+
+def _series_simuladas(n_series=3, n=200, semilla=1):
+    # ARIMA(1,1,1)x(1,0,0,4): x_t = 0.5 x_{t-1} + 0.4 x_{t-4} - 0.2 x_{t-5} + e_t + 0.3 e_{t-1}
+    rng = np.random.default_rng(semilla)
+    columnas = {}
+    for i in range(n_series):
+        e = rng.normal(size=n)
+        x = np.zeros(n)
+        for t in range(5, n):
+            x[t] = 0.5 * x[t - 1] + 0.4 * x[t - 4] - 0.2 * x[t - 5] + e[t] + 0.3 * e[t - 1]
+        columnas[f's{i}'] = np.cumsum(x) + 100
+    return pd.DataFrame(columnas, index=pd.date_range('2015-01-04', periods=n, freq='W'))
+
+
+def test_polinomio_sin_componente_estacional():
+    coeficientes = np.array([[0.5], [0.2]])
+    assert np.array_equal(_polinomio_lotes(coeficientes, 0, -1), np.ones((2, 1)))
+    assert np.array_equal(_polinomio_lotes(np.zeros((2, 0)), 12, 1), np.ones((2, 1)))
+
+    estructura = EstructuraSARIMA((1, 1, 1), (0, 0, 0, 0))
+    phi, theta, _, _ = estructura.polinomios(np.array([[0.5, 0.3]]))
+    assert phi[0, 0] == pytest.approx(0.5)
+    assert theta[0, :2] == pytest.approx([1.0, 0.3])
+
+
+def test_covarianza_estacionaria():
+    estructura = EstructuraSARIMA((1, 0, 1), (1, 0, 0, 4))
+    parametros = estructura.restringir(np.array([[0.8, 0.4, 1.5], [-0.3, -0.7, 0.2]]))
+    phi, theta, _, _ = estructura.polinomios(parametros)
+    P = covarianza_estacionaria(phi, theta)
+    for i in range(2):
+        T = np.eye(phi.shape[1], k=1)
+        T[:, 0] = phi[i]
+        assert P[i] == pytest.approx(solve_discrete_lyapunov(T, np.outer(theta[i], theta[i])))
+
+
+def test_coincide_con_sarimax():
+    data = _series_simuladas()
+    resultados = ajustar_sarima_lotes(data, order=(1, 1, 1), seasonal_order=(1, 0, 0, 4))
+    for columna in data.columns:
+        lote = resultados[columna]
+        sarimax = SARIMAX(data[columna], order=(1, 1, 1), seasonal_order=(1, 0, 0, 4), **OPCIONES_SARIMAX).fit(disp=False)
+        assert lote.llf == pytest.approx(sarimax.llf, abs=1e-4)
+        assert lote.params.to_numpy() == pytest.approx(sarimax.params.to_numpy(), rel=1e-2)
+
+        # Pronóstico en niveles: el mismo modelo sin diferenciar antes, filtrado con los parámetros del lote
+        niveles = SARIMAX(data[columna], order=(1, 1, 1), seasonal_order=(1, 0, 0, 4), enforce_stationarity=True,
+                          enforce_invertibility=False).filter(lote.params.to_numpy())
+        esperado, obtenido = niveles.get_forecast(12), lote.get_forecast(12)
+        assert obtenido.predicted_mean.to_numpy() == pytest.approx(esperado.predicted_mean.to_numpy(), rel=1e-6)
+        assert obtenido.se_mean.to_numpy() == pytest.approx(esperado.se_mean.to_numpy(), rel=1e-4)
+        assert obtenido.predicted_mean.index.equals(esperado.predicted_mean.index)
+
+
+def test_ajusta_modelo_semanal_con_menos_semanas_que_estados():
+    # 92 semanas, como weekly_ingredients.csv: 39 observaciones diferenciadas y 54 estados
+    data = _series_simuladas(n_series=2, n=92, semilla=2)
+    resultados = ajustar_sarima_lotes(data, order=(1, 1, 1), seasonal_order=(1, 1, 1, 52))
+    retvals = [resultados[columna].mle_retvals for columna in data.columns]
+    assert retvals[0] is not retvals[1]
+    for columna in data.columns:
+        lote = resultados[columna]
+        modelo = SARIMAX(data[columna], order=(1, 1, 1), seasonal_order=(1, 1, 1, 52), **OPCIONES_SARIMAX)
+        assert np.isfinite(lote.llf)
+        assert modelo.loglike(lote.params.to_numpy()) == pytest.approx(lote.llf, rel=1e-8)
+        assert lote.mle_retvals['converged']
+
+
+def test_rechaza_series_con_menos_observaciones_que_parametros():
+    data = _series_simuladas(n_series=2, n=57)
+    with pytest.raises(ValueError):
+        ajustar_sarima_lotes(data, order=(1, 1, 1), seasonal_order=(1, 1, 1, 52))
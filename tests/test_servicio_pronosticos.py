@@ -0,0 +1,45 @@
+import json
+import threading
+import http.client
+from urllib.parse import quote
+import numpy as np
+import pandas as pd
+import pytest
+from servicio_pronosticos import ServicioPronosticos, crear_servidor
+
+
+@pytest.fixture
+def servicio(tmp_path):
+    # Serie cerca de 0 con ruido: los cuantiles bajos de la normal quedan negativos
+    rng = np.random.default_rng(3)
+    fechas = pd.date_range('2021-01-04', periods=60, freq='W-MON')
+    datos = pd.DataFrame({'Sal (g)': 1.0 + rng.normal(scale=5.0, size=len(fechas))}, index=fechas)
+    archivo = tmp_path / 'weekly.csv'
+    datos.to_csv(archivo, encoding='utf-8-sig')
+    return ServicioPronosticos(str(archivo), order=(1, 0, 0), seasonal_order=(0, 0, 0, 0))
+
+
+def test_media_y_cuantiles_recortados_en_cero(servicio):
+    respuesta = servicio.forecast('Sal (g)', steps=8, quantiles=(0.05, 0.95))
+
+    assert (respuesta >= 0).all().all()
+    assert (respuesta['q0.05'] == 0).any()
+    assert (respuesta['q0.95'] > 0).all()
+
+
+def test_insumo_desconocido_devuelve_json_400(servicio):
+    servidor = crear_servidor(servicio, port=0)
+    hilo = threading.Thread(target=servidor.serve_forever, daemon=True)
+    hilo.start()
+    try:
+        conexion = http.client.HTTPConnection(*servidor.server_address, timeout=10)
+        conexion.request('GET', '/forecast?ingredient=' + quote('X€'))
+        respuesta = conexion.getresponse()
+        cuerpo = json.loads(respuesta.read().decode('utf-8'))
+    finally:
+        servidor.shutdown()
+        servidor.server_close()
+
+    assert respuesta.status == 400
+    assert respuesta.getheader('Content-Type') == 'application/json; charset=utf-8'
+    assert cuerpo == {'error': 'Insumo desconocido: X€'}
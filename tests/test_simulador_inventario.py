@@ -0,0 +1,28 @@
+import numpy as np
+import pytest
+from simulador_inventario import escenarios_demanda, evaluar_politicas, simular_politicas
+
+
+def test_escenarios_repiten_cada_fila_por_separado():
+    # 48 semanas de pronóstico extendidas a 52: cada insumo repite su propio pronóstico
+    pronostico = np.vstack([np.full(48, 300.0), np.full(48, 6.0)])
+    demanda = escenarios_demanda(pronostico, np.zeros(2), n_escenarios=3, semanas=52)
+    assert demanda.shape == (3, 2, 52)
+    assert np.all(demanda[:, 0] == 300.0)
+    assert np.all(demanda[:, 1] == 6.0)
+
+
+def test_pedido_en_camino_al_final_no_se_paga():
+    # El stock inicial cubre la demanda; el pedido de la última semana no llega dentro del horizonte
+    demanda = np.full((1, 1, 3), 10.0)
+    resultado = simular_politicas(demanda, q=np.array([[100.0]]), r=np.array([[5.0]]), costo_orden=0.0,
+                                  c1=np.zeros(1), b=np.ones(1), costo_faltante=np.full(1, 2.0),
+                                  stock_inicial=np.array([[30.0]]))
+    assert resultado['Atendida'][0, 0, 0] == 30.0
+    assert resultado['Costo'][0, 0, 0] == 0.0
+
+
+def test_costo_faltante_debe_superar_al_precio():
+    with pytest.raises(ValueError):
+        evaluar_politicas(['a'], np.ones((1, 4)), np.zeros(1), np.ones((1, 1)), np.ones((1, 1)), 0.0,
+                          c1=np.ones(1), b=np.ones(1), costo_faltante=np.ones(1), n_escenarios=1)
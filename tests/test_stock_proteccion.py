@@ -0,0 +1,37 @@
+import numpy as np
+import pandas as pd
+import pytest
+from stock_proteccion import calcular_stock_proteccion
+
+
+@pytest.mark.parametrize('metodo', ['empirico', 'normal', 'bootstrap'])
+def test_sesgo_no_anula_el_stock_de_proteccion(metodo):
+    rng = np.random.default_rng(1)
+    fechas = pd.date_range('2021-01-04', periods=156, freq='W-MON')
+    primera_mitad = fechas.isocalendar().week.to_numpy() <= 26
+    # Temporada 1: pronóstico sesgado 5 kg por encima; temporada 2: sin sesgo. Ruido de 1 kg en ambas.
+    error = rng.normal(scale=1000.0, size=len(fechas)) + np.where(primera_mitad, 5000.0, 0.0)
+    errores = pd.DataFrame({'Serie': 'Sal (g)', 'Fecha': fechas, 'Error': error})
+    temporadas = [
+        {"nombre": "1", "duracion_temporada": 26, "demandas": {"Sal": {"media": 5.0, "de": 1.0}}},
+        {"nombre": "2", "duracion_temporada": 26, "demandas": {"Sal": {"media": 5.0, "de": 1.0}}},
+    ]
+
+    sp = calcular_stock_proteccion(errores, temporadas, ['Sal'], nivel_servicio=0.95, metodo=metodo, semilla=0)
+
+    assert sp.loc['1', 'Sal'] == pytest.approx(1.645, rel=0.35)
+    assert sp.loc['2', 'Sal'] == pytest.approx(1.645, rel=0.35)
+
+
+def test_combinacion_sin_datos_usa_el_valor_agrupado():
+    fechas = pd.date_range('2021-01-04', periods=20, freq='W-MON')  # sólo semanas de la temporada 1
+    errores = pd.DataFrame({'Serie': 'Sal (g)', 'Fecha': fechas, 'Error': np.linspace(-2000, 2000, 20)})
+    temporadas = [
+        {"nombre": "1", "duracion_temporada": 26, "demandas": {"Sal": {"media": 5.0, "de": 1.0}}},
+        {"nombre": "2", "duracion_temporada": 26, "demandas": {"Sal": {"media": 5.0, "de": 1.0}}},
+    ]
+
+    sp = calcular_stock_proteccion(errores, temporadas, ['Sal'])
+
+    assert sp.loc['2', 'Sal'] == pytest.approx(sp.loc['1', 'Sal'])
+    assert sp.loc['2', 'Sal'] > 0
@@ -1,6 +1,7 @@
 import pandas as pd
 import re
 import os
+import profiling
 
 def load_and_clean_data(input_file):
     """
@@ -13,7 +14,9 @@ def load_and_clean_data(input_file):
         pd.DataFrame: DataFrame limpio y procesado.
 
     """
-    data = pd.read_csv(input_file, encoding='ISO-8859-1')
+    with profiling.stage('read_sales_csv') as etapa:
+        data = pd.read_csv(input_file, encoding='ISO-8859-1')
+        etapa.record(filas=len(data), archivo=input_file)
     
     # Eliminar todo símbolo no numérico del precio unitario.
     data['unit_price'] = data['unit_price'].apply(lambda x: re.sub(r'[^\d,.-]', '', x))
@@ -38,4 +41,23 @@ def crear_carpeta(carpeta):
         carpeta (str): Ruta de la carpeta a crear.
     """
     if not os.path.exists(carpeta):
-        os.makedirs(carpeta)
\ No newline at end of file
+        os.makedirs(carpeta)
+
+
+def fechas_pronostico(fechas, steps):
+    """
+    Fechas de los períodos a pronosticar, continuando la frecuencia de la serie.
+
+    Todos los pronósticos (SARIMA e intermitentes) usan esta función, así comparten el mismo
+    calendario que los datos (por ejemplo, semanas que empiezan el lunes).
+
+    Args:
+        fechas (pd.DatetimeIndex): Fechas de la serie histórica.
+        steps (int): Cantidad de períodos a pronosticar.
+
+    Returns:
+        pd.DatetimeIndex: Fechas posteriores a la última observación.
+    """
+    fechas = pd.DatetimeIndex(fechas)
+    frecuencia = fechas.freq or pd.infer_freq(fechas) or 'W'
+    return pd.date_range(fechas[-1], periods=steps + 1, freq=frecuencia)[1:]